@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def temporary_cache(django_test_environment):
+    """Общий кэш тестов — во временном файле, а не в кэше dev-сервера."""
+    from posts.tests.runner import temporary_cache
+
+    with temporary_cache():
+        yield
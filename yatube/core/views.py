@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.shortcuts import render
+from django.views import static
 
 
 def page_not_found(request, exception):
@@ -11,3 +13,10 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def media(request, path, document_root=None):
+    # Имена файлов — хэши содержимого: по одному URL всегда один файл.
+    response = static.serve(request, path, document_root=document_root)
+    response['Cache-Control'] = settings.MEDIA_CACHE_CONTROL
+    return response
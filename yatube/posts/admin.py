@@ -1,9 +1,21 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post, Comment, Follow
 
 
-class PostAdmin(admin.ModelAdmin):
+class IndexedSearchMixin:
+    """Поиск в админке по индексу FTS5 вместо LIKE '%…%'."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search.match_query(search_term):
+            return queryset, False
+        return queryset.filter(
+            pk__in=search.matching(self.model, search_term)
+        ), False
+
+
+class PostAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
@@ -11,11 +23,11 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('title', 'description',)
     list_filter = ('title',)
     empty_value_display = '-пусто-'
-    search_fields = ('title',)
+    search_fields = ('title', 'description')
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,137 @@
+"""Подсказки имён пользователей и групп по префиксу в памяти процесса.
+
+Имена пользователей, slug и названия групп лежат в отсортированных
+массивах; поиск по префиксу — два bisect и срез, без запросов к базе.
+Сигналы User и Group правят массивы этого процесса на месте и
+увеличивают поколение 'autocomplete'. Если поколение выросло не только
+из-за этой правки, значит, данные менял и другой процесс: тогда индекс
+перечитывается целиком при следующем обращении, как реестр групп.
+"""
+import threading
+from bisect import bisect_left, insort
+
+from . import caching
+from .models import Group, User
+
+SCOPE = 'autocomplete'
+LIMIT = 10
+
+_lock = threading.Lock()
+_state = None
+
+
+class PrefixIndex:
+    """Отсортированный массив пар (ключ, id) с поиском по префиксу."""
+
+    def __init__(self, items=()):
+        self.texts = dict(items)
+        self.keys = sorted(
+            (text.casefold(), pk) for pk, text in self.texts.items()
+        )
+
+    def add(self, pk, text):
+        self.remove(pk)
+        self.texts[pk] = text
+        insort(self.keys, (text.casefold(), pk))
+
+    def remove(self, pk):
+        text = self.texts.pop(pk, None)
+        if text is None:
+            return
+        key = (text.casefold(), pk)
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+
+    def search(self, prefix, limit):
+        prefix = prefix.casefold()
+        position = bisect_left(self.keys, (prefix,))
+        found = []
+        for key, pk in self.keys[position:position + limit]:
+            if not key.startswith(prefix):
+                break
+            found.append(pk)
+        return found
+
+
+def _load(generation):
+    groups = list(Group.objects.values_list('pk', 'slug', 'title'))
+    return {
+        'generation': generation,
+        'users': PrefixIndex(User.objects.values_list('pk', 'username')),
+        'slugs': PrefixIndex((pk, slug) for pk, slug, _ in groups),
+        'titles': PrefixIndex((pk, title) for pk, _, title in groups),
+    }
+
+
+def _current():
+    global _state
+    generation = caching.generation(SCOPE)
+    state = _state
+    if state is None or state['generation'] != generation:
+        state = _state = _load(generation)
+    return state
+
+
+def suggest(prefix, limit=LIMIT):
+    """Пользователи и группы, чьё имя, slug или название начинается
+    с prefix."""
+    state = _current()
+    with _lock:
+        users = state['users']
+        slugs, titles = state['slugs'], state['titles']
+        group_ids = dict.fromkeys(
+            slugs.search(prefix, limit) + titles.search(prefix, limit)
+        )
+        return {
+            'users': [
+                {'username': users.texts[pk]}
+                for pk in users.search(prefix, limit)
+            ],
+            'groups': [
+                {'slug': slugs.texts[pk], 'title': titles.texts[pk]}
+                for pk in list(group_ids)[:limit]
+            ],
+        }
+
+
+def _apply(change):
+    seen = _state['generation'] if _state is not None else None
+    caching.bump(SCOPE)
+    generation = caching.generation(SCOPE)
+    state = _state
+    if state is None or seen is None or generation != seen + 1:
+        # Индекс менялся и в другом процессе: перечитаем при обращении.
+        return
+    with _lock:
+        change(state)
+        state['generation'] = generation
+
+
+def user_saved(user):
+    # Только уже загруженный индекс: запись не должна перечитывать
+    # таблицы, даже если индекс устарел.
+    state = _state
+    if state is not None and state['users'].texts.get(
+        user.pk
+    ) == user.username:
+        return
+    _apply(lambda state: state['users'].add(user.pk, user.username))
+
+
+def user_deleted(user_id):
+    _apply(lambda state: state['users'].remove(user_id))
+
+
+def group_saved(group):
+    def change(state):
+        state['slugs'].add(group.pk, group.slug)
+        state['titles'].add(group.pk, group.title)
+    _apply(change)
+
+
+def group_deleted(group_id):
+    def change(state):
+        state['slugs'].remove(group_id)
+        state['titles'].remove(group_id)
+    _apply(change)
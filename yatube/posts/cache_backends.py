@@ -0,0 +1,437 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим SQLite-файлом.
+
+SQLiteCache — общий уровень: один файл на все процессы, атомарные
+add/incr в транзакциях SQLite, без внешних сервисов и без запросов
+через соединение Django. TieredCache держит перед ним небольшой LRU
+с коротким сроком жизни. Каждая запись через TieredCache добавляет
+ключ в журнал инвалидаций общего уровня; другие процессы не реже раза
+в SYNC_INTERVAL секунд читают журнал и выбрасывают изменённые ключи.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SQLITE_TIMEOUT = 5
+SEQUENCE_KEY = 'tiered:sequence'
+JOURNAL_KEY = 'tiered:journal:{}'
+JOURNAL_TIMEOUT = 60 * 10
+# Если процесс отстал сильнее, проще очистить его уровень целиком.
+JOURNAL_MAX_LAG = 1000
+STATS_KEY = 'tiered:stats:{}'
+PIDS_KEY = 'tiered:pids'
+
+_missing = object()
+
+
+@contextmanager
+def _immediate(connection):
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._path, timeout=SQLITE_TIMEOUT, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Это кэш: потеря последних записей при сбое допустима.
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _alive(expires):
+        return expires is None or expires > time.time()
+
+    def get(self, key, default=None, version=None):
+        row = self._connection().execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (self._key(key, version),),
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        rows = self._connection().execute(
+            'SELECT key, value, expires FROM cache WHERE key IN ({})'.format(
+                ', '.join('?' * len(keys))
+            ),
+            list(keys),
+        )
+        return {
+            keys[key]: pickle.loads(value)
+            for key, value, expires in rows if self._alive(expires)
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (
+                self._key(key, version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout),
+            ),
+        )
+        self._cull(connection)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with _immediate(connection):
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (
+                    key,
+                    pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                    self.get_backend_timeout(timeout),
+                ),
+            ).rowcount
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with _immediate(connection):
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            # Вставка заново, а не UPDATE: для _cull это свежая запись.
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), row[1]),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ?',
+            (self.get_backend_timeout(timeout), self._key(key, version)),
+        ).rowcount)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version=version) is not _missing
+
+    def delete(self, key, version=None):
+        self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def stats(self):
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache'
+        ).fetchone()
+        return {'entries': entries, 'bytes': size}
+
+    def _cull(self, connection):
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            # Каждая запись вставляет строку заново, поэтому порядок rowid —
+            # порядок последней записи. Первыми уходят давно записанные
+            # ключи независимо от срока: иначе бессрочные записи вытесняли
+            # бы блокировки и журнал сразу после их записи.
+            connection.execute(
+                'DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache '
+                'ORDER BY rowid LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+
+class LocalTier:
+    """LRU процесса; общий для всех потоков, как данные LocMemCache."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.seen = None
+        self.synced = 0
+        self.published = set()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _missing
+            if entry[1] <= time.time():
+                self._discard(key)
+                return _missing
+            self.entries.move_to_end(key)
+            return pickle.loads(entry[0])
+
+    def set(self, key, value, expires, max_entries):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self._discard(key)
+            self.entries[key] = (pickled, expires)
+            self.size += len(key) + len(pickled)
+            while len(self.entries) > max_entries:
+                self._discard(next(iter(self.entries)))
+
+    def discard(self, *keys):
+        with self.lock:
+            for key in keys:
+                self._discard(key)
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(key) + len(entry[0])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def _rate(counter, tier):
+    total = counter[f'{tier}_hits'] + counter[f'{tier}_misses']
+    return counter[f'{tier}_hits'] / total if total else None
+
+
+class TieredCache(BaseCache):
+    """LRU процесса перед общим кэшем из CACHES[OPTIONS['SHARED']].
+
+    Значения в LRU живут не дольше LOCAL_TIMEOUT секунд, поэтому даже
+    при потере журнала другой процесс увидит запись не позже этого срока.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1)
+        with _tiers_lock:
+            self._tier = _tiers.setdefault(location, LocalTier())
+
+    @property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT):
+        expires = time.time() + self._local_timeout
+        backend_timeout = self.get_backend_timeout(timeout)
+        if backend_timeout is not None:
+            expires = min(expires, backend_timeout)
+        self._tier.set(key, value, expires, self._max_entries)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._key(key, version)
+        self._sync()
+        value = self._tier.get(local_key)
+        if value is not _missing:
+            self._tier.hits['local'] += 1
+            return value
+        self._tier.misses['local'] += 1
+        value = self._shared.get(key, _missing, version=version)
+        if value is _missing:
+            self._tier.misses['shared'] += 1
+            return default
+        self._tier.hits['shared'] += 1
+        self._remember(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found, rest = {}, []
+        for key in keys:
+            value = self._tier.get(self._key(key, version))
+            if value is _missing:
+                rest.append(key)
+            else:
+                found[key] = value
+        self._tier.hits['local'] += len(found)
+        self._tier.misses['local'] += len(rest)
+        if rest:
+            shared = self._shared.get_many(rest, version=version)
+            self._tier.hits['shared'] += len(shared)
+            self._tier.misses['shared'] += len(rest) - len(shared)
+            for key, value in shared.items():
+                self._remember(self._key(key, version), value)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._key(key, version)
+        self._shared.set(key, value, timeout, version=version)
+        self._remember(local_key, value, timeout)
+        self._publish(local_key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._key(key, version)
+        if not self._shared.add(key, value, timeout, version=version):
+            return False
+        self._remember(local_key, value, timeout)
+        self._publish(local_key)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self._key(key, version)
+        try:
+            value = self._shared.incr(key, delta, version=version)
+        except ValueError:
+            self._tier.discard(local_key)
+            raise
+        self._remember(local_key, value)
+        self._publish(local_key)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._tier.discard(self._key(key, version))
+        return self._shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self._key(key, version)
+        self._shared.delete(key, version=version)
+        self._tier.discard(local_key)
+        self._publish(local_key)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version=version) is not _missing
+
+    def clear(self):
+        # Вместе с общим уровнем пропадает и счётчик журнала: по этому
+        # признаку остальные процессы очистят свои уровни.
+        self._shared.clear()
+        self._tier.clear()
+        self._tier.seen = None
+
+    def _publish(self, local_key):
+        shared = self._shared
+        try:
+            sequence = shared.incr(SEQUENCE_KEY)
+        except ValueError:
+            shared.add(SEQUENCE_KEY, 0, None)
+            sequence = shared.incr(SEQUENCE_KEY)
+        shared.set(JOURNAL_KEY.format(sequence), local_key, JOURNAL_TIMEOUT)
+        self._tier.published.add(sequence)
+
+    def _sync(self):
+        tier = self._tier
+        now = time.monotonic()
+        if now - tier.synced < self._sync_interval:
+            return
+        tier.synced = now
+        shared = self._shared
+        sequence = shared.get(SEQUENCE_KEY, 0)
+        seen, tier.seen = tier.seen, sequence
+        if seen is None or sequence == seen:
+            return self._publish_stats()
+        if not seen < sequence <= seen + JOURNAL_MAX_LAG:
+            tier.clear()
+            tier.published.clear()
+            return self._publish_stats()
+        numbers = set(range(seen + 1, sequence + 1)) - tier.published
+        tier.published -= set(range(seen + 1, sequence + 1))
+        journal = shared.get_many(JOURNAL_KEY.format(n) for n in numbers)
+        if len(journal) < len(numbers):
+            tier.clear()
+        else:
+            tier.discard(*journal.values())
+        self._publish_stats()
+
+    def _publish_stats(self):
+        pid = os.getpid()
+        shared = self._shared
+        shared.set(STATS_KEY.format(pid), self.local_stats(), JOURNAL_TIMEOUT)
+        pids = shared.get(PIDS_KEY, [])
+        if pid not in pids:
+            shared.set(PIDS_KEY, [*pids, pid][-JOURNAL_MAX_LAG:], None)
+
+    def local_stats(self):
+        """Попадания по уровням и память LRU текущего процесса."""
+        tier = self._tier
+        counters = Counter({
+            'local_hits': tier.hits['local'],
+            'local_misses': tier.misses['local'],
+            'shared_hits': tier.hits['shared'],
+            'shared_misses': tier.misses['shared'],
+        })
+        return {
+            **counters,
+            'local_hit_rate': _rate(counters, 'local'),
+            'shared_hit_rate': _rate(counters, 'shared'),
+            'local_entries': len(tier.entries),
+            'local_bytes': tier.size,
+        }
+
+    def stats(self):
+        """Статистика всех процессов, отчитавшихся через общий уровень."""
+        shared = self._shared
+        pids = shared.get(PIDS_KEY, [])
+        processes = shared.get_many(STATS_KEY.format(pid) for pid in pids)
+        shared_stats = getattr(shared, 'stats', None)
+        return {
+            'processes': {
+                int(key.rsplit(':', 1)[1]): value
+                for key, value in processes.items()
+            },
+            'shared': shared_stats() if shared_stats else {},
+        }
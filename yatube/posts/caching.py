@@ -0,0 +1,167 @@
+"""Поколения кэша: фрагмент хранится вместе со счётчиком поколения области.
+
+Запись в Post/Comment/Group увеличивает поколения затронутых областей,
+поэтому фрагменты можно хранить без срока жизни: после изменения
+данных фрагмент со старым поколением считается устаревшим.
+Те же области служат суррогатными ключами страниц для
+PageCacheMiddleware: ответ устаревает, когда сменилось поколение
+хотя бы одного из его ключей.
+
+get_or_set защищает дорогие значения от одновременного пересчёта:
+пересчитывает один держатель блокировки, остальные получают
+устаревшее значение.
+"""
+import math
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import Signal
+
+GENERATION_KEY = 'generation:{}'
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+LOCK_KEY = 'lock:{}'
+
+# Отправляется при каждом обращении к кэшу фрагмента.
+fragment_cache_lookup = Signal(providing_args=['name', 'hit'])
+
+hits = Counter()
+misses = Counter()
+
+
+def scope(*parts):
+    return ':'.join(str(part) for part in parts)
+
+
+def _initial():
+    # Стартовое значение не должно совпасть с поколением, которое было
+    # до вытеснения ключа, иначе ожили бы устаревшие фрагменты.
+    return time.time_ns() // 1000
+
+
+def generation(name):
+    key = GENERATION_KEY.format(name)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _initial(), None)
+        value = cache.get(key)
+    return value
+
+
+def generations(names):
+    """Текущие поколения областей; вытесненные в результат не попадают."""
+    keys = {GENERATION_KEY.format(name): name for name in names}
+    return {
+        keys[key]: value for key, value in cache.get_many(keys).items()
+    }
+
+
+def bump(*names):
+    for name in names:
+        key = GENERATION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial(), None)
+
+
+def post_scopes(post):
+    scopes = {
+        'posts', scope('post', post.pk), scope('author', post.author_id)
+    }
+    for group_id in (post.group_id, getattr(post, '_loaded_group_id', None)):
+        if group_id is not None:
+            scopes.add(scope('group', group_id))
+    return scopes
+
+
+def tag(response, *names):
+    """Помечает ответ суррогатными ключами областей, от которых он зависит."""
+    response[SURROGATE_KEY_HEADER] = ' '.join(
+        name for name in names if name
+    )
+    return response
+
+
+def _is_fresh(entry, version, beta):
+    _, entry_version, expires, delta = entry
+    if entry_version != version:
+        return False
+    if expires is None:
+        return True
+    # XFetch: чем дольше пересчёт и ближе срок, тем вероятнее
+    # досрочное обновление; у разных процессов моменты расходятся.
+    early = -delta * beta * math.log(1 - random.random())
+    return time.time() + early < expires
+
+
+def get_or_set(key, compute, timeout=None, version=None, beta=1.0):
+    """Значение из кэша с защитой от одновременного пересчёта.
+
+    Значение устаревает по timeout или при смене version (поколения).
+    Пересчитывает тот, кто взял короткую блокировку, остальные в это
+    время получают прежнее значение: запись живёт на CACHE_GRACE
+    секунд дольше timeout. Без прежнего значения вычисляет каждый.
+    """
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, version, beta):
+        return entry[0]
+    lock = LOCK_KEY.format(key)
+    if not cache.add(lock, True, settings.CACHE_LOCK_TIMEOUT):
+        return entry[0] if entry is not None else compute()
+    try:
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        if timeout is None:
+            cache.set(key, (value, version, None, delta), None)
+        else:
+            cache.set(
+                key,
+                (value, version, time.time() + timeout, delta),
+                timeout + settings.CACHE_GRACE,
+            )
+    finally:
+        cache.delete(lock)
+    return value
+
+
+def get_many_or_set(versions, compute, timeout=None):
+    """Значения по ключам {key: version} из кэша одним обращением.
+
+    Недостающие и устаревшие ключи вычисляет один вызов
+    compute(keys) -> {key: value} и сохраняет на timeout секунд. Для
+    дешёвых значений, которые выгоднее пересчитать пачкой, чем
+    защищать блокировкой, как в get_or_set.
+    """
+    values = {
+        key: entry[0]
+        for key, entry in cache.get_many(list(versions)).items()
+        if _is_fresh(entry, versions[key], 1.0)
+    }
+    missing = [key for key in versions if key not in values]
+    if missing:
+        computed = compute(missing)
+        cache.set_many(
+            {
+                key: (value, versions[key], None, 0)
+                for key, value in computed.items()
+            },
+            timeout,
+        )
+        values.update(computed)
+    return values
+
+
+def record(name, hit):
+    (hits if hit else misses)[name] += 1
+    fragment_cache_lookup.send(sender=None, name=name, hit=hit)
+
+
+def hit_ratio(name=None):
+    hit = hits[name] if name else sum(hits.values())
+    miss = misses[name] if name else sum(misses.values())
+    total = hit + miss
+    return hit / total if total else None
@@ -0,0 +1,106 @@
+"""Денормализованные счётчики постов, комментариев, подписок и тегов.
+
+Счётчики меняются атомарными UPDATE ... SET x = x + 1 из сигналов,
+а расхождения выравнивает команда reconcile_counters.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post, PostTag, Tag, User
+
+
+def bump_author(user_id, field, delta):
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gt': 0})
+    updated = stats.update(**{field: F(field) + delta})
+    if not updated and delta > 0:
+        # Строки ещё нет: создаём её сразу с пересчитанными значениями.
+        ensure_stats([user_id])
+
+
+def bump_comments(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gt=0)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def ensure_stats(user_ids=None):
+    users = User.objects.filter(stats__isnull=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    created = AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=user_id)
+         for user_id in users.values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    if created:
+        reconcile_authors(AuthorStats.objects.filter(
+            user_id__in=[stats.user_id for stats in created]
+        ))
+    return len(created)
+
+
+def _total(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def reconcile_authors(stats=None):
+    """Пересчитывает счётчики авторов; возвращает число исправлений."""
+    stats = AuthorStats.objects.all() if stats is None else stats
+    actual = User.objects.annotate(
+        real_posts=_total(Post.objects, 'author'),
+        real_followers=_total(Follow.objects, 'author'),
+        real_following=_total(Follow.objects, 'user'),
+    ).filter(pk__in=stats.values('user_id'))
+    fixed = 0
+    for user_id, posts, followers, following in actual.values_list(
+        'pk', 'real_posts', 'real_followers', 'real_following'
+    ).iterator():
+        fixed += AuthorStats.objects.filter(user_id=user_id).exclude(
+            posts_count=posts,
+            followers_count=followers,
+            following_count=following,
+        ).update(
+            posts_count=posts,
+            followers_count=followers,
+            following_count=following,
+        )
+    return fixed
+
+
+def reconcile_posts():
+    """Пересчитывает comments_count постов; возвращает число исправлений."""
+    actual = Post.objects.annotate(
+        real=_total(Comment.objects, 'post')
+    ).exclude(comments_count=F('real'))
+    fixed = 0
+    for post_id, comments in actual.values_list('pk', 'real').iterator():
+        fixed += Post.objects.filter(pk=post_id).update(
+            comments_count=comments
+        )
+    return fixed
+
+
+def reconcile_tags():
+    """Пересчитывает posts_count тегов; возвращает число исправлений."""
+    actual = Tag.objects.annotate(
+        real=_total(PostTag.objects, 'tag')
+    ).exclude(posts_count=F('real'))
+    fixed = 0
+    for tag_id, posts in actual.values_list('pk', 'real').iterator():
+        fixed += Tag.objects.filter(pk=tag_id).update(posts_count=posts)
+    return fixed
+
+
+def reconcile():
+    created = ensure_stats()
+    return (
+        created, reconcile_authors(), reconcile_posts(), reconcile_tags()
+    )
@@ -0,0 +1,267 @@
+"""Ленты подписок: гибрид push (fan-out on write) и pull.
+
+Посты обычных авторов раскладываются по лентам подписчиков при
+публикации. Посты авторов, у которых подписчиков больше
+FEED_FANOUT_THRESHOLD, не раскладываются, а подмешиваются при чтении.
+Способ доставки хранится в AuthorStats.feed_pulled и вместе со всеми
+записями ленты автора меняется командой sync_feed_delivery, поэтому
+разложенные и подмешиваемые посты не пересекаются. После смены порога
+или правки счётчиков в обход сигналов ленты выравнивает команда
+rebuild_feed.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AuthorStats, FeedItem, Follow, Post
+
+BATCH_SIZE = 500
+MAX_MERGED_AUTHORS = 100
+
+
+def _feed_lookup(lookup):
+    if lookup == 'pk' or lookup.startswith('pk__'):
+        return 'post_id' + lookup[2:]
+    if lookup.lstrip('-') == 'pk':
+        return lookup.replace('pk', 'post_id')
+    return lookup
+
+
+def _feed_q(node):
+    children = [
+        _feed_q(child) if isinstance(child, Q)
+        else (_feed_lookup(child[0]), child[1])
+        for child in node.children
+    ]
+    return Q(*children, _connector=node.connector, _negated=node.negated)
+
+
+class Timeline:
+    """Лента как упорядоченная последовательность постов.
+
+    Сливает материализованные записи ленты с постами «тяжёлых» авторов
+    authors, поддерживает срезы и count() для Paginator, а также
+    order_by() и filter() для CursorPaginator. Срез выполняется в базе
+    одним UNION ALL: записи ленты и посты каждого автора из authors
+    читаются по индексу уже в нужном порядке, и SQLite сливает их без
+    сортировки. Поэтому pushed не должен содержать записей авторов из
+    authors.
+    """
+
+    ordered = True
+
+    def __init__(self, pushed, pulled=None, authors=()):
+        self.pushed = pushed
+        self.pulled = pulled
+        self.authors = list(authors)
+
+    def _copy(self, pushed, pulled):
+        return Timeline(pushed, pulled, self.authors)
+
+    def count(self):
+        count = self.pushed.count()
+        if self.authors:
+            count += self.pulled.filter(author_id__in=self.authors).count()
+        return count
+
+    def __len__(self):
+        return self.count()
+
+    def order_by(self, *fields):
+        return self._copy(
+            self.pushed.order_by(*map(_feed_lookup, fields)),
+            self.pulled.order_by(*fields) if self.pulled is not None
+            else None,
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._copy(
+            self.pushed.filter(
+                *map(_feed_q, args),
+                **{_feed_lookup(k): v for k, v in kwargs.items()}
+            ),
+            self.pulled.filter(*args, **kwargs) if self.pulled is not None
+            else None,
+        )
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.authors:
+            return [item.post for item in self.pushed[key]]
+        # По части на автора: условие author_id IN (...) заставило бы
+        # SQLite сортировать все посты этих авторов. Число частей
+        # составного запроса в SQLite ограничено.
+        if len(self.authors) < MAX_MERGED_AUTHORS:
+            pulled = [
+                self.pulled.filter(author_id=author_id)
+                for author_id in self.authors
+            ]
+        else:
+            pulled = [self.pulled.filter(author_id__in=self.authors)]
+        rows = self.pushed.order_by().values_list('pub_date', 'post_id').union(
+            *(
+                part.order_by().values_list('pub_date', 'pk')
+                for part in pulled
+            ),
+            all=True,
+        ).order_by(*self.pushed.query.order_by)[key]
+        ids = [post_id for _, post_id in rows]
+        posts = Post.objects.select_related('author').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def is_pulled(author_id):
+    return AuthorStats.objects.filter(
+        user_id=author_id, feed_pulled=True
+    ).exists()
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, чьи посты подмешиваются."""
+    return list(Follow.objects.filter(
+        user=user, author__stats__feed_pulled=True,
+    ).values_list('author_id', flat=True))
+
+
+def timeline(user):
+    """Лента подписок пользователя."""
+    pushed = FeedItem.objects.filter(user=user).select_related(
+        'post__author'
+    ).order_by('-pub_date', 'post_id')
+    authors = pulled_authors(user)
+    if not authors:
+        return Timeline(pushed)
+    # Записи, оставшиеся от автора до перехода на pull, не считаются.
+    return Timeline(
+        pushed.exclude(author_id__in=authors),
+        Post.objects.select_related('author').order_by('-pub_date', 'pk'),
+        authors,
+    )
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Возвращает число записей ленты, созданных для поста.
+    """
+    if is_pulled(post.author_id):
+        return 0
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True))
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(
+                user_id=user_id,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return len(followers)
+
+
+def _fan_out(user_ids, author_id):
+    # Посты автора на pull не раскладываются: проверка в том же запросе.
+    # Глубже FEED_BACKFILL_DEPTH ленту почти не листают.
+    posts = list(Post.objects.filter(
+        author_id=author_id, author__stats__feed_pulled=False
+    ).order_by('-pub_date', 'pk').values_list(
+        'pk', 'pub_date'
+    )[:settings.FEED_BACKFILL_DEPTH])
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id in user_ids
+            for post_id, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты автора."""
+    _fan_out([user_id], author_id)
+
+
+def _crossing(pulled):
+    # Между порогами автор остаётся как есть: подписка и отписка
+    # на границе не гоняют его записи туда и обратно.
+    threshold = settings.FEED_FANOUT_THRESHOLD
+    if pulled:
+        return AuthorStats.objects.filter(
+            feed_pulled=True,
+            followers_count__lt=threshold * settings.FEED_PUSH_RATIO,
+        )
+    return AuthorStats.objects.filter(
+        feed_pulled=False, followers_count__gt=threshold
+    )
+
+
+def sync_delivery():
+    """Переводит на pull авторов, у которых подписчиков больше
+    FEED_FANOUT_THRESHOLD, и обратно на push тех, у кого их стало меньше
+    FEED_FANOUT_THRESHOLD * FEED_PUSH_RATIO.
+
+    Вызывается по расписанию командой sync_feed_delivery, а не при
+    подписке: перевод переносит записи ленты всех подписчиков автора.
+    Возвращает число переведённых авторов.
+    """
+    switched = 0
+    for pulled in (False, True):
+        authors = list(_crossing(pulled).values_list('user_id', flat=True))
+        for author_id in authors:
+            with transaction.atomic():
+                AuthorStats.objects.filter(user_id=author_id).update(
+                    feed_pulled=not pulled
+                )
+                if pulled:
+                    _fan_out(
+                        Follow.objects.filter(
+                            author_id=author_id
+                        ).values_list('user_id', flat=True),
+                        author_id,
+                    )
+                else:
+                    FeedItem.objects.filter(author_id=author_id).delete()
+            switched += 1
+    return switched
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты с нуля; возвращает число подписок."""
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    items = FeedItem.objects.all()
+    if user_ids is None:
+        # Все ленты собираются заново, поэтому способ доставки можно
+        # сверить с порогами без переноса записей.
+        for pulled in (False, True):
+            _crossing(pulled).update(feed_pulled=not pulled)
+    else:
+        follows = follows.filter(user_id__in=user_ids)
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    count = 0
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
+        count += 1
+    return count
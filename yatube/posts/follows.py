@@ -0,0 +1,46 @@
+"""Граф подписок в кэше: множество id авторов для каждого читателя.
+
+Множество хранится вместе с поколением области follows:<user_id> и
+пересчитывается одним запросом по индексу, когда поколение сменилось.
+Подписка и отписка увеличивают поколение сразу и ещё раз после коммита,
+записывая свежее множество: так другой процесс, прочитавший базу до
+коммита, не закрепит в кэше устаревшие данные.
+"""
+from . import caching
+from .models import Follow
+
+KEY = 'following:{}'
+
+
+def _scope(user_id):
+    return caching.scope('follows', user_id)
+
+
+def following_ids(user_id):
+    """Множество id авторов, на которых подписан пользователь."""
+    return caching.get_or_set(
+        KEY.format(user_id),
+        lambda: frozenset(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True)),
+        version=caching.generation(_scope(user_id)),
+    )
+
+
+def is_following(user, author_id):
+    return user.is_authenticated and author_id in following_ids(user.pk)
+
+
+def follow_states(user, author_ids):
+    """Подписан ли пользователь на каждого из авторов — за одно обращение."""
+    following = following_ids(user.pk) if user.is_authenticated else ()
+    return {author_id: author_id in following for author_id in author_ids}
+
+
+def invalidate(user_id):
+    caching.bump(_scope(user_id))
+
+
+def refresh(user_id):
+    invalidate(user_id)
+    following_ids(user_id)
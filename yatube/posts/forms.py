@@ -1,7 +1,12 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 
+from . import uploads
 from .models import Post, Comment
 
+MEGABYTE = 1024 * 1024
+
 
 class PostForm(forms.ModelForm):
     class Meta:
@@ -13,6 +18,46 @@ class PostForm(forms.ModelForm):
                       'text': 'Введите ссообщение',
                       'image': 'Выберите изображение'}
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.image_fields = None
+        image = self.files.get('image')
+        # Обрезанный обработчиком загрузки файл Pillow не откроет:
+        # убираем его до проверки поля и сообщаем о размере в clean_image.
+        self.oversized = image is not None and uploads.is_oversized(image)
+        if self.oversized:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if self.oversized:
+            raise forms.ValidationError(
+                'Файл больше %(size)s МБ.',
+                code='file_too_large',
+                params={'size': settings.IMAGE_MAX_UPLOAD_SIZE // MEGABYTE},
+            )
+        if not isinstance(image, UploadedFile):
+            return image
+        if uploads.is_bomb(image.image.size):
+            raise forms.ValidationError(
+                'Слишком большое разрешение картинки.',
+                code='too_many_pixels',
+            )
+        image, self.image_fields = uploads.ingest(image)
+        return image
+
+    def save(self, commit=True):
+        if self.image_fields is None and not self.instance.image:
+            self.image_fields = {
+                'image_width': None,
+                'image_height': None,
+                'image_placeholder': '',
+            }
+        for name, value in (self.image_fields or {}).items():
+            setattr(self.instance, name, value)
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
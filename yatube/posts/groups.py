@@ -0,0 +1,59 @@
+"""Реестр групп в памяти процесса.
+
+Таблица групп маленькая и меняется редко, поэтому при первом обращении
+она читается целиком и индексируется по slug и id. Сигналы Group
+увеличивают поколение 'groups' в общем кэше; реестр сверяет его при
+каждом обращении и перечитывает таблицу, если группы изменил этот или
+другой процесс. Несуществующий slug отвечает None без запроса к базе,
+пока поколение не сменилось.
+"""
+from django.http import Http404
+
+from . import caching
+from .models import Group
+
+SCOPE = 'groups'
+
+_state = {'generation': None, 'by_slug': {}, 'by_id': {}}
+
+
+def _groups():
+    global _state
+    generation = caching.generation(SCOPE)
+    state = _state
+    if state['generation'] != generation:
+        groups = list(Group.objects.all())
+        # Словарь подменяется целиком, поэтому потоки без блокировки
+        # видят либо старое, либо новое состояние.
+        state = _state = {
+            'generation': generation,
+            'by_slug': {group.slug: group for group in groups},
+            'by_id': {group.pk: group for group in groups},
+        }
+    return state
+
+
+def get(slug):
+    return _groups()['by_slug'].get(slug)
+
+
+def get_by_id(group_id):
+    """Группа поста; id берётся из внешнего ключа, поэтому группа есть в
+    базе, даже если этот процесс ещё не увидел смену поколения."""
+    if group_id is None:
+        return None
+    group = _groups()['by_id'].get(group_id)
+    if group is None:
+        group = Group.objects.filter(pk=group_id).first()
+    return group
+
+
+def get_or_404(slug):
+    group = get(slug)
+    if group is None:
+        raise Http404('No Group matches the given query.')
+    return group
+
+
+def invalidate():
+    caching.bump(SCOPE)
@@ -0,0 +1,353 @@
+"""Фоновая подготовка адаптивных вариантов картинок постов.
+
+Запросы не обрабатывают картинки: новая или заменённая картинка ставит
+задачу ImageJob, воркер (команда process_images) режет её под пропорции
+ленты в ширинах WIDTHS и форматах FORMATS, которые умеет сохранять
+Pillow, записывает варианты в реестр ImageVariant и отмечает пост
+image_ready. До этого шаблоны выводят заглушку.
+
+После смены геометрии или хранилища все варианты заново создаёт
+команда rebuild_images в пуле процессов.
+"""
+import base64
+import logging
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import caching, media
+from .models import ImageJob, ImageVariant, Post
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (480, 960, 1440)
+# Пропорции прежней миниатюры 960x339.
+RATIO = 339 / 960
+# В порядке предпочтения; JPEG — запасной вариант для <img>.
+FORMATS = ('AVIF', 'WEBP', 'JPEG')
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+QUALITY = 80
+# Заглушка в пропорциях ленты: несколько сотен байт прямо в разметке.
+PLACEHOLDER_SIZE = (24, 8)
+PLACEHOLDER_QUALITY = 40
+VARIANTS_DIR = 'variants'
+PICTURE_KEY = 'picture:{}'
+MAX_ATTEMPTS = 3
+# Задачу упавшего воркера после этого срока возьмёт другой.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+CLAIM_BATCH = 10
+
+
+def supported_formats():
+    Image.init()
+    return [image_format for image_format in FORMATS
+            if image_format in Image.SAVE]
+
+
+def variant_name(source, width, image_format):
+    stem = os.path.splitext(source)[0]
+    return f'{VARIANTS_DIR}/{stem}-{width}w.{image_format.lower()}'
+
+
+def placeholder(image):
+    """Крошечное размытое превью картинки как data: URI."""
+    preview = ImageOps.fit(image.convert('RGB'), PLACEHOLDER_SIZE)
+    buffer = BytesIO()
+    preview.save(buffer, 'JPEG', quality=PLACEHOLDER_QUALITY)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def describe(image):
+    """Поля поста, которые шаблоны берут вместо чтения файла."""
+    return {
+        'image_width': image.width,
+        'image_height': image.height,
+        'image_placeholder': placeholder(image),
+    }
+
+
+def render_variants(source):
+    """Сохраняет файлы вариантов source, не обращаясь к базе.
+
+    Возвращает описание исходной картинки (describe) и несохранённые
+    записи реестра.
+    """
+    with default_storage.open(source) as file:
+        image = Image.open(file)
+        image.load()
+    # ingest поворачивает по EXIF только уменьшаемые картинки.
+    image = ImageOps.exif_transpose(image)
+    fields = describe(image)
+    image = image.convert('RGB')
+    widths = [width for width in WIDTHS if width <= image.width]
+    variants = []
+    for width in widths or WIDTHS[:1]:
+        size = (width, round(width * RATIO))
+        resized = ImageOps.fit(image, size, Image.LANCZOS)
+        for image_format in supported_formats():
+            buffer = BytesIO()
+            resized.save(buffer, image_format, quality=QUALITY)
+            name = default_storage.save(
+                variant_name(source, width, image_format),
+                ContentFile(buffer.getvalue()),
+            )
+            variants.append(ImageVariant(
+                source=source,
+                format=image_format,
+                width=size[0],
+                height=size[1],
+                file=name,
+            ))
+    return fields, variants
+
+
+def register_variants(source, variants):
+    """Заменяет варианты source в реестре и удаляет устаревшие файлы."""
+    with transaction.atomic():
+        previous = ImageVariant.objects.filter(source=source)
+        stale = list(previous.values_list('file', flat=True))
+        previous.delete()
+        ImageVariant.objects.bulk_create(variants)
+    media.delete_variant_files(stale)
+    caching.bump(caching.scope('variants', source))
+
+
+def make_variants(source):
+    """Создаёт варианты файла source и перезаписывает их в реестре.
+
+    Возвращает описание исходной картинки (describe).
+    """
+    fields, variants = render_variants(source)
+    register_variants(source, variants)
+    return fields
+
+
+def _picture(variants):
+    by_format = defaultdict(list)
+    for variant in variants:
+        by_format[variant.format].append(variant)
+    fallback = by_format.get('JPEG')
+    if not fallback:
+        return None
+
+    def srcset(variants):
+        return ', '.join(
+            f'{default_storage.url(variant.file)} {variant.width}w'
+            for variant in variants
+        )
+
+    largest = fallback[-1]
+    return {
+        'sources': [
+            {'type': MIME_TYPES[image_format], 'srcset': srcset(variants)}
+            for image_format, variants in sorted(
+                by_format.items(), key=lambda item: FORMATS.index(item[0])
+            )
+            if image_format != 'JPEG'
+        ],
+        'src': default_storage.url(largest.file),
+        'srcset': srcset(fallback),
+        'width': largest.width,
+        'height': largest.height,
+    }
+
+
+def _load_pictures(sources):
+    by_source = defaultdict(list)
+    for variant in ImageVariant.objects.filter(
+        source__in=sources
+    ).order_by('source', 'width'):
+        by_source[variant.source].append(variant)
+    return {source: _picture(by_source[source]) for source in sources}
+
+
+def pictures(sources):
+    """Данные для <picture> по файлам sources: одно обращение к кэшу и
+    не больше одного запроса к реестру вариантов."""
+    if not sources:
+        return {}
+    scopes = {source: caching.scope('variants', source) for source in sources}
+    generations = caching.generations(scopes.values())
+    keys = {
+        PICTURE_KEY.format(source): source for source in scopes
+    }
+    values = caching.get_many_or_set(
+        {
+            key: generations.get(scopes[source])
+            or caching.generation(scopes[source])
+            for key, source in keys.items()
+        },
+        lambda missing: {
+            PICTURE_KEY.format(source): picture
+            for source, picture in _load_pictures(
+                [keys[key] for key in missing]
+            ).items()
+        },
+        timeout=settings.FRAGMENT_CACHE_TIMEOUT,
+    )
+    return {keys[key]: value for key, value in values.items()}
+
+
+def picture(source):
+    """Данные для <picture> одного файла."""
+    return pictures([source])[source]
+
+
+def page_pictures(page):
+    """Картинки всех постов страницы; загружаются одной пачкой при
+    первом обращении и запоминаются на странице."""
+    if not hasattr(page, 'pictures'):
+        page.pictures = pictures({
+            post.image.name for post in page
+            if post.image and post.image_ready
+        })
+    return page.pictures
+
+
+def enqueue(post):
+    Post.objects.filter(pk=post.pk).update(image_ready=False)
+    if post.image:
+        ImageJob.objects.create(post=post, image=post.image.name)
+
+
+def process_post_images(post):
+    source = post.image.name
+    # Одинаковые загрузки хранятся одним файлом, и его варианты
+    # могли уже появиться для другого поста.
+    if post.image_placeholder and ImageVariant.objects.filter(
+        source=source
+    ).exists():
+        return {
+            'image_width': post.image_width,
+            'image_height': post.image_height,
+            'image_placeholder': post.image_placeholder,
+        }
+    return make_variants(source)
+
+
+def claim():
+    """Берёт в работу самую старую задачу; безопасно для нескольких
+    воркеров: задачу получает тот, чей UPDATE её изменил."""
+    now = timezone.now()
+    pending = ImageJob.objects.filter(finished__isnull=True).filter(
+        Q(started__isnull=True) | Q(started__lt=now - CLAIM_TIMEOUT)
+    ).order_by('pk')
+    for job in pending[:CLAIM_BATCH]:
+        if ImageJob.objects.filter(pk=job.pk, started=job.started).update(
+            started=now, attempts=F('attempts') + 1
+        ):
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run(job):
+    post = Post.objects.filter(pk=job.post_id).first()
+    if post is None or post.image.name != job.image:
+        # Картинку успели заменить: её обработает более новая задача.
+        ImageJob.objects.filter(pk=job.pk).update(finished=timezone.now())
+        return False
+    try:
+        fields = process_post_images(post)
+    except Exception as error:
+        logger.exception('Задача %s', job.pk)
+        failed = job.attempts >= MAX_ATTEMPTS
+        ImageJob.objects.filter(pk=job.pk).update(
+            started=job.started if failed else None,
+            finished=timezone.now() if failed else None,
+            error=str(error),
+        )
+        return False
+    ImageJob.objects.filter(pk=job.pk).update(
+        finished=timezone.now(), error=''
+    )
+    # updated_at меняется, чтобы пересобрались фрагменты статьи и ETag.
+    # Описание нужно постам, картинки которых загружены не через форму.
+    Post.objects.filter(pk=post.pk, image=job.image).update(
+        image_ready=True, updated_at=timezone.now(), **fields
+    )
+    caching.bump(*caching.post_scopes(post))
+    return True
+
+
+def work(limit=None):
+    """Обрабатывает очередь до конца или до limit задач."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim()
+        if job is None:
+            break
+        run(job)
+        processed += 1
+    return processed
+
+
+def _render_quietly(source):
+    # Выполняется в дочернем процессе: ошибка одной картинки
+    # не должна останавливать весь пул.
+    try:
+        return render_variants(source)
+    except Exception:
+        logger.exception('Картинка %s', source)
+        return None
+
+
+def rebuild(after=0, chunk_size=100, workers=None):
+    """Пересоздаёт варианты картинок постов с id больше after.
+
+    Посты обходятся чанками по возрастанию id; файлы чанка рендерятся
+    параллельно в пуле из workers процессов, а реестр и посты
+    обновляет текущий процесс. После каждого чанка выдаёт
+    (id последнего поста, обработано картинок, ошибок).
+    """
+    # Дочерние процессы получают настройки Django через fork,
+    # но не должны унаследовать открытые соединения с базой.
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        while True:
+            rows = list(Post.objects.filter(pk__gt=after).exclude(
+                image=''
+            ).order_by('pk').values_list('pk', 'image')[:chunk_size])
+            if not rows:
+                return
+            posts = defaultdict(list)
+            for post_id, source in rows:
+                posts[source].append(post_id)
+            done = failed = 0
+            for source, result in zip(
+                posts, pool.map(_render_quietly, posts)
+            ):
+                if result is None:
+                    failed += 1
+                    continue
+                fields, variants = result
+                register_variants(source, variants)
+                Post.objects.filter(pk__in=posts[source]).update(
+                    image_ready=True, updated_at=timezone.now(), **fields
+                )
+                done += 1
+            scopes = set()
+            for post in Post.objects.filter(
+                pk__in=[post_id for post_id, _ in rows]
+            ).only('author_id', 'group_id'):
+                scopes |= caching.post_scopes(post)
+            caching.bump(*scopes)
+            after = rows[-1][0]
+            yield after, done, failed
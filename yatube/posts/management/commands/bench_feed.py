@@ -0,0 +1,92 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+
+from posts import counters, feed
+from posts.models import FeedItem, Follow, Post, User
+from posts.utils import pagination
+
+PREFIX = 'bench-feed'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает усиление записи и задержку чтения ленты '
+        'при разных порогах FEED_FANOUT_THRESHOLD. '
+        'Все данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=5000)
+        parser.add_argument('--authors', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20)
+        parser.add_argument('--reads', type=int, default=50)
+        parser.add_argument(
+            '--thresholds', type=int, nargs='+',
+            default=[0, 100, 1000, 100000],
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            'threshold  rows/post  write ms/post  read ms/page'
+        )
+        for threshold in options['thresholds']:
+            with override_settings(FEED_FANOUT_THRESHOLD=threshold):
+                with transaction.atomic():
+                    row = self.run(threshold, options)
+                    transaction.set_rollback(True)
+            self.stdout.write(
+                '{:>9}  {:>9.1f}  {:>13.2f}  {:>12.2f}'.format(*row)
+            )
+
+    def run(self, threshold, options):
+        User.objects.bulk_create(
+            User(username=f'{PREFIX}-reader-{i}')
+            for i in range(options['followers'])
+        )
+        User.objects.bulk_create(
+            User(username=f'{PREFIX}-author-{i}')
+            for i in range(options['authors'])
+        )
+        followers = list(User.objects.filter(
+            username__startswith=f'{PREFIX}-reader-'
+        ))
+        authors = list(User.objects.filter(
+            username__startswith=f'{PREFIX}-author-'
+        ).order_by('pk'))
+        star, regular = authors[0], authors[1:]
+        reader = followers[0]
+        Follow.objects.bulk_create(
+            Follow(user=user, author=star) for user in followers
+        )
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for author in regular
+        )
+        # bulk_create обходит сигналы: счётчики подписчиков и способ
+        # доставки, от которых зависит push или pull, выставляются явно.
+        counters.ensure_stats([user.pk for user in followers + authors])
+        feed.sync_delivery()
+
+        rows_before = FeedItem.objects.count()
+        started = perf_counter()
+        for i in range(options['posts']):
+            for author in authors:
+                Post.objects.create(text=f'{PREFIX} {i}', author=author)
+        elapsed = perf_counter() - started
+        posts = options['posts'] * len(authors)
+        rows = FeedItem.objects.count() - rows_before
+
+        request = RequestFactory().get('/follow/')
+        started = perf_counter()
+        for _ in range(options['reads']):
+            list(pagination(request, feed.timeline(reader)))
+        read = perf_counter() - started
+
+        return (
+            threshold,
+            rows / posts,
+            elapsed / posts * 1000,
+            read / options['reads'] * 1000,
+        )
@@ -0,0 +1,95 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from posts import search
+from posts.models import Post, User
+from posts.utils import POSTS_COUNT
+
+PREFIX = 'bench-search'
+LETTERS = 'абвгдежзиклмнопрстуфхцчшщэюя'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск через icontains и через индекс FTS5 на '
+        'первой странице выдачи. Все данные создаются в транзакции '
+        'и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--words', type=int, default=30)
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--reads', type=int, default=20)
+        parser.add_argument(
+            '--queries', nargs='+',
+            help='По умолчанию частое, среднее и редкое слово, '
+                 'пара частых слов и префикс',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            words = self.populate(options)
+            queries = options['queries'] or [
+                words[0],
+                words[len(words) // 50],
+                words[-1],
+                f'{words[0]} {words[1]}',
+                words[len(words) // 50][:3],
+            ]
+            self.stdout.write(
+                'query                  matches  icontains ms  fts5 ms'
+            )
+            for query in queries:
+                self.stdout.write(
+                    '{:<21}  {:>7}  {:>12.2f}  {:>7.2f}'.format(
+                        query, *self.run(query, options['reads'])
+                    )
+                )
+            transaction.set_rollback(True)
+
+    def populate(self, options):
+        author = User.objects.create(username=f'{PREFIX}-author')
+        rng = random.Random(0)
+        words = sorted({
+            ''.join(rng.choices(LETTERS, k=rng.randint(3, 10)))
+            for _ in range(options['vocabulary'])
+        })
+        rng.shuffle(words)
+        # Частоты слов убывают по закону Ципфа, как в живом тексте.
+        weights = [1 / rank for rank in range(1, len(words) + 1)]
+        Post.objects.bulk_create(
+            (
+                Post(author=author, text=' '.join(rng.choices(
+                    words, weights, k=options['words']
+                )))
+                for _ in range(options['posts'])
+            ),
+            batch_size=500,
+        )
+        search.rebuild()
+        return words
+
+    def run(self, query, reads):
+        posts = Post.objects.select_related('author')
+        for word in query.split():
+            posts = posts.filter(text__icontains=word)
+        started = perf_counter()
+        for _ in range(reads):
+            list(Paginator(posts, POSTS_COUNT).get_page(1))
+        baseline = perf_counter() - started
+
+        started = perf_counter()
+        for _ in range(reads):
+            page = Paginator(search.Results(query), POSTS_COUNT).get_page(1)
+            list(page)
+        indexed = perf_counter() - started
+        return (
+            page.paginator.count,
+            baseline / reads * 1000,
+            indexed / reads * 1000,
+        )
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает попадания по уровням кэша и память LRU процессов, '
+        'отчитавшихся через общий уровень'
+    )
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, 'stats'):
+            raise CommandError('Кэш по умолчанию не TieredCache')
+        stats = cache.stats()
+        self.stdout.write(
+            '    pid  local hit  shared hit  entries     bytes'
+        )
+        for pid, process in sorted(stats['processes'].items()):
+            self.stdout.write('{:>7}  {:>9}  {:>10}  {:>7}  {:>8}'.format(
+                pid,
+                self.rate(process['local_hit_rate']),
+                self.rate(process['shared_hit_rate']),
+                process['local_entries'],
+                process['local_bytes'],
+            ))
+        shared = stats['shared']
+        if shared:
+            self.stdout.write(
+                f'Общий уровень: {shared["entries"]} записей, '
+                f'{shared["bytes"]} байт'
+            )
+
+    @staticmethod
+    def rate(value):
+        return '-' if value is None else f'{value:.0%}'
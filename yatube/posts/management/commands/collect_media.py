@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = 'Сверяет ссылки на файлы картинок и удаляет файлы без ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delay', type=int, default=None,
+            help='Сколько секунд файл должен пробыть без ссылок',
+        )
+
+    def handle(self, *args, **options):
+        fixed = media.reconcile()
+        removed = media.collect(options['delay'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: {fixed}, удалено файлов: {removed}'
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер очереди картинок: генерирует миниатюры постов, '
+        'поставленные в очередь при создании и правке'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и выйти',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2,
+            help='Пауза между опросами пустой очереди, секунды',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = images.work()
+            if processed:
+                self.stdout.write(f'Обработано задач: {processed}')
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
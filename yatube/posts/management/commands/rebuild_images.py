@@ -0,0 +1,58 @@
+import os
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересоздаёт варианты всех картинок постов в пуле процессов. '
+        'Прерванный запуск продолжается с последнего чанка.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=100)
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов (по умолчанию по числу ядер)',
+        )
+        parser.add_argument(
+            '--checkpoint', default=settings.IMAGE_REBUILD_CHECKPOINT,
+            help='Файл с id последнего обработанного поста',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не читая контрольную точку',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        after = 0
+        if not options['restart'] and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                after = int(file.read() or 0)
+            self.stdout.write(f'Продолжаем после поста {after}')
+        started = perf_counter()
+        done = failed = 0
+        for after, chunk_done, chunk_failed in images.rebuild(
+            after, options['chunk_size'], options['workers']
+        ):
+            with open(checkpoint, 'w') as file:
+                file.write(str(after))
+            done += chunk_done
+            failed += chunk_failed
+            elapsed = perf_counter() - started
+            self.stdout.write(
+                f'до поста {after}: картинок {done}, ошибок {failed}, '
+                f'{done / elapsed:.1f} картинок/с'
+            )
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: картинок {done}, ошибок {failed} за {elapsed:.1f} с '
+            f'({done / elapsed if elapsed else 0:.1f} картинок/с)'
+        ))
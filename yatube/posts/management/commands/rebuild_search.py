@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Заполняет заново полнотекстовые индексы постов и групп'
+
+    def handle(self, *args, **options):
+        counts = ', '.join(
+            f'{table} — {count}' for table, count in search.rebuild().items()
+        )
+        self.stdout.write(self.style.SUCCESS(f'Индексы пересобраны: {counts}'))
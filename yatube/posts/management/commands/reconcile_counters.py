@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с данными и исправляет их'
+
+    def handle(self, *args, **options):
+        created, authors, posts, tags = counters.reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано счётчиков авторов: {created}, '
+            f'исправлено авторов: {authors}, постов: {posts}, '
+            f'тегов: {tags}'
+        ))
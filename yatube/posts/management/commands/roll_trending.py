@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет интервалы активности старше окна и пересчитывает '
+        'популярные посты и группы. Запускается по расписанию, '
+        'например раз в TRENDING_BUCKET секунд'
+    )
+
+    def handle(self, *args, **options):
+        removed = trending.roll_off()
+        top = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено интервалов: {removed}, популярных постов: '
+            f'{len(top["posts"])}, групп: {len(top["groups"])}'
+        ))
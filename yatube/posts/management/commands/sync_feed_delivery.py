@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит авторов между раскладкой постов по лентам и '
+        'подмешиванием при чтении по числу подписчиков. Запускается '
+        'по расписанию, например раз в несколько минут'
+    )
+
+    def handle(self, *args, **options):
+        switched = feed.sync_delivery()
+        self.stdout.write(
+            self.style.SUCCESS(f'Переведено авторов: {switched}')
+        )
@@ -0,0 +1,94 @@
+"""Счётчики ссылок на файлы картинок.
+
+Хранилище называет файлы по хэшу содержимого, поэтому одинаковые
+загрузки делят один файл и общие варианты. MediaFile считает посты,
+которые ссылаются на файл; счётчики меняют сигналы Post. Файлы без
+ссылок и их варианты удаляет команда collect_media, но не раньше
+MEDIA_COLLECT_DELAY: за это время загрузка того же содержимого,
+которая нашла готовый файл, успевает на него сослаться.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import caching
+from .models import ImageVariant, MediaFile, Post
+
+
+def acquire(name):
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=name)], ignore_conflicts=True
+    )
+    MediaFile.objects.filter(name=name).update(
+        refs=F('refs') + 1, updated=timezone.now()
+    )
+
+
+def release(name):
+    MediaFile.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1, updated=timezone.now()
+    )
+
+
+def delete_variant_files(names):
+    """Удаляет файлы вариантов, на которые больше нет ссылок в реестре."""
+    used = set(ImageVariant.objects.filter(file__in=names).values_list(
+        'file', flat=True
+    ))
+    for name in set(names) - used:
+        default_storage.delete(name)
+
+
+def _touched_since(name, cutoff):
+    return (
+        default_storage.exists(name)
+        and default_storage.get_modified_time(name) >= cutoff
+    )
+
+
+def collect(delay=None):
+    """Удаляет файлы без ссылок вместе с вариантами; возвращает их число."""
+    if delay is None:
+        delay = settings.MEDIA_COLLECT_DELAY
+    cutoff = timezone.now() - timedelta(seconds=delay)
+    orphans = MediaFile.objects.filter(refs=0, updated__lt=cutoff)
+    removed = 0
+    for name in orphans.values_list('name', flat=True).iterator():
+        if _touched_since(name, cutoff):
+            continue
+        with transaction.atomic():
+            if not MediaFile.objects.filter(name=name, refs=0).delete()[0]:
+                continue
+            variants = ImageVariant.objects.filter(source=name)
+            files = list(variants.values_list('file', flat=True))
+            variants.delete()
+        default_storage.delete(name)
+        delete_variant_files(files)
+        caching.bump(caching.scope('variants', name))
+        removed += 1
+    return removed
+
+
+def reconcile():
+    """Пересчитывает ссылки по постам; возвращает число исправлений."""
+    actual = dict(
+        Post.objects.exclude(image='').order_by().values('image').annotate(
+            total=Count('pk')
+        ).values_list('image', 'total')
+    )
+    fixed = 0
+    for name, refs in MediaFile.objects.values_list(
+        'name', 'refs'
+    ).iterator():
+        total = actual.pop(name, 0)
+        if refs != total:
+            fixed += MediaFile.objects.filter(name=name).update(refs=total)
+    MediaFile.objects.bulk_create(
+        (MediaFile(name=name, refs=total) for name, total in actual.items()),
+        ignore_conflicts=True,
+    )
+    return fixed + len(actual)
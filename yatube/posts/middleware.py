@@ -0,0 +1,109 @@
+"""Кэш целых страниц для анонимных читателей.
+
+Ответы, помеченные суррогатными ключами (caching.tag), сохраняются
+вместе с поколениями этих ключей. Сигналы записи увеличивают поколения
+затронутых ключей, и такие страницы перестают отдаваться из кэша.
+Попадание обслуживается двумя обращениями к кэшу, без сессии и ORM.
+
+Поколения снимаются до рендера, иначе запись, пришедшая во время
+рендера, сохранила бы старую страницу под новым поколением. Ключи
+страницы известны только после рендера, поэтому первый ответ по адресу
+лишь запоминает их, а в кэш попадает следующий.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import caching
+
+PAGE_KEY = 'page:{}'
+NAMES_KEY = 'page-keys:{}'
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(path)
+
+
+def _names_key(key):
+    return NAMES_KEY.format(key)
+
+
+def is_anonymous(request):
+    # Наличие cookie сессии проверяется без обращения к хранилищу сессий.
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+    )
+
+
+class PageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_anonymous(request):
+            return self.get_response(request)
+        key = _page_key(request)
+        found = cache.get_many([key, _names_key(key)])
+        response = self.lookup(request, found.get(key))
+        if response is not None:
+            return response
+        names = found.get(_names_key(key), ())
+        snapshot = caching.generations(names)
+        for name in set(names) - snapshot.keys():
+            snapshot[name] = caching.generation(name)
+        response = self.get_response(request)
+        self.store(key, response, snapshot)
+        return response
+
+    def lookup(self, request, entry):
+        if entry is None:
+            caching.record('page', False)
+            return None
+        content, status, headers, generations = entry
+        if caching.generations(generations) != generations:
+            caching.record('page', False)
+            return None
+        caching.record('page', True)
+        response = HttpResponse(content, status=status)
+        for header, value in headers:
+            response[header] = value
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
+
+    def store(self, key, response, snapshot):
+        names = response.get(caching.SURROGATE_KEY_HEADER, '').split()
+        if (
+            not names
+            or response.status_code != 200
+            or response.streaming
+            or response.cookies
+        ):
+            return
+        # Ключи живут столько же, сколько страница: адресов с разными
+        # параметрами запроса сколько угодно.
+        if not snapshot.keys() >= set(names):
+            # Ключи этой страницы ещё не были известны до рендера.
+            cache.set(_names_key(key), names, settings.PAGE_CACHE_TIMEOUT)
+            return
+        cache.set_many({
+            key: (
+                response.content,
+                response.status_code,
+                list(response.items()),
+                {name: snapshot[name] for name in names},
+            ),
+            _names_key(key): names,
+        }, settings.PAGE_CACHE_TIMEOUT)
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def enqueue_existing(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageJob = apps.get_model('posts', 'ImageJob')
+    ImageJob.objects.bulk_create(
+        ImageJob(post_id=post_id, image=image)
+        for post_id, image in Post.objects.exclude(image='').order_by(
+            'pk'
+        ).values_list('pk', 'image').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Миниатюры готовы'),
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=100, verbose_name='Файл')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Взято в работу')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='posts.Post')),
+            ],
+            options={
+                'verbose_name': 'Задача обработки картинки',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='imagejob',
+            index=models.Index(condition=models.Q(finished__isnull=True), fields=['id'], name='posts_imagejob_pending_idx'),
+        ),
+        migrations.RunPython(enqueue_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:48
+
+from django.db import migrations, models
+
+
+def requeue_images(apps, schema_editor):
+    # Миниатюры sorl не попадают в реестр вариантов: пересоздаём всё.
+    Post = apps.get_model('posts', 'Post')
+    ImageJob = apps.get_model('posts', 'ImageJob')
+    posts = Post.objects.exclude(image='')
+    posts.update(image_ready=False)
+    ImageJob.objects.filter(finished__isnull=True).delete()
+    ImageJob.objects.bulk_create(
+        ImageJob(post_id=post_id, image=image)
+        for post_id, image in posts.order_by('pk').values_list(
+            'pk', 'image'
+        ).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_image_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100, verbose_name='Исходный файл')),
+                ('format', models.CharField(max_length=4, verbose_name='Формат')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('file', models.CharField(max_length=255, verbose_name='Файл')),
+            ],
+            options={
+                'verbose_name': 'Вариант картинки',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagevariant',
+            constraint=models.UniqueConstraint(fields=('source', 'format', 'width'), name='unique_image_variant'),
+        ),
+        migrations.RunPython(requeue_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:53
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    MediaFile.objects.bulk_create(
+        MediaFile(name=name, refs=total)
+        for name, total in Post.objects.exclude(image='').order_by().values(
+            'image'
+        ).annotate(total=Count('pk')).values_list('image', 'total')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_image_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Файл')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+            },
+        ),
+        migrations.AlterField(
+            model_name='imagevariant',
+            name='file',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='Файл'),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(condition=models.Q(refs=0), fields=['updated'], name='posts_mediafile_orphan_idx'),
+        ),
+        migrations.RunPython(populate_refs, migrations.RunPython.noop),
+    ]
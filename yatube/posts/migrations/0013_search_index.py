@@ -0,0 +1,29 @@
+from django.db import migrations
+
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2'"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                f'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+                f'text, {TOKENIZE})',
+                'INSERT INTO posts_post_fts (rowid, text) '
+                'SELECT id, text FROM posts_post',
+                f'CREATE VIRTUAL TABLE posts_group_fts USING fts5('
+                f'title, description, {TOKENIZE})',
+                'INSERT INTO posts_group_fts (rowid, title, description) '
+                'SELECT id, title, description FROM posts_group',
+            ],
+            [
+                'DROP TABLE posts_group_fts',
+                'DROP TABLE posts_post_fts',
+            ],
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:03
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TAG = re.compile(r'(?<![\w#&])#(\w{1,50})(?!\w)')
+
+
+def populate_tags(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Tag = apps.get_model('posts', 'Tag')
+    PostTag = apps.get_model('posts', 'PostTag')
+    links = {}
+    for post_id, text, pub_date in Post.objects.values_list(
+        'pk', 'text', 'pub_date'
+    ).iterator():
+        for name in {name.casefold() for name in TAG.findall(text)}:
+            links.setdefault(name, []).append((post_id, pub_date))
+    Tag.objects.bulk_create(
+        Tag(name=name, posts_count=len(posts))
+        for name, posts in links.items()
+    )
+    tag_ids = dict(Tag.objects.values_list('name', 'pk'))
+    PostTag.objects.bulk_create(
+        (
+            PostTag(post_id=post_id, tag_id=tag_ids[name], pub_date=pub_date)
+            for name, posts in links.items()
+            for post_id, pub_date in posts
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Тег')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+            ],
+            options={
+                'verbose_name': 'Тег',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Post')),
+                ('tag', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Tag')),
+            ],
+            options={
+                'verbose_name': 'Тег поста',
+                'ordering': ('-pub_date',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-pub_date', 'post'], name='posts_postt_tag_id_71e611_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('post', 'tag'), name='unique_post_tag'),
+        ),
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled_authors(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    FeedItem = apps.get_model('posts', 'FeedItem')
+    pulled = AuthorStats.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_THRESHOLD
+    )
+    pulled.update(feed_pulled=True)
+    FeedItem.objects.filter(
+        author_id__in=pulled.values('user_id')
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, verbose_name='Посты подмешиваются в ленты при чтении'),
+        ),
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+    ]
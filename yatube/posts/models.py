@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 POST_LENGHT = 200
 SLICE_TEXT = 15
+# Поля, которые меняются только UPDATE-запросами в обход save().
+DERIVED_FIELDS = ('comments_count', 'image_ready')
 
 
 class Group(models.Model):
@@ -18,6 +20,7 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField('Введите текст')
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -39,13 +42,56 @@ class Post(models.Model):
         blank=True,
         help_text='Выберите картинку'
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки', blank=True, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False
+    )
+    image_ready = models.BooleanField(
+        'Миниатюры готовы', default=False, editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['group', '-pub_date']),
+            models.Index(fields=['author', '-pub_date']),
+            models.Index(fields=['-pub_date', 'id']),
+            models.Index(fields=['updated_at']),
+        ]
 
     def __str__(self):
         return self.text[:SLICE_TEXT]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Нужны при сохранении: сбросить кэш прежней группы,
+        # заметить замену картинки и правку тегов в тексте.
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        instance._loaded_image = instance.__dict__.get('image')
+        instance._loaded_text = instance.__dict__.get('text')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Счётчики и готовность миниатюр меняются только UPDATE-запросами,
+        # поэтому обычное сохранение не должно затирать их устаревшими
+        # значениями.
+        if not self._state.adding and 'update_fields' not in kwargs:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -65,6 +111,9 @@ class Comment(models.Model):
     class Meta:
         ordering = ['-created']
         verbose_name = 'Комментарий'
+        indexes = [
+            models.Index(fields=['post', '-created']),
+        ]
 
     def __str__(self) -> str:
         return self.text[:SLICE_TEXT]
@@ -93,3 +142,222 @@ class Follow(models.Model):
             name='unique_following'
         )
     ]
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        primary_key=True,
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    feed_pulled = models.BooleanField(
+        'Посты подмешиваются в ленты при чтении', default=False
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+
+    def __str__(self) -> str:
+        return f'Счётчики {self.user_id}'
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик',
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_item'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', 'post']),
+            models.Index(fields=['user', 'author']),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.post} в ленте {self.user}'
+
+
+class Tag(models.Model):
+    name = models.CharField('Тег', max_length=50, unique=True)
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        verbose_name = 'Тег'
+
+    def __str__(self) -> str:
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        db_index=False,
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        db_index=False,
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Тег поста'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'tag'],
+                name='unique_post_tag'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-pub_date', 'post']),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.tag_id} у поста {self.post_id}'
+
+
+class Activity(models.Model):
+    """Число событий за интервал длиной TRENDING_BUCKET секунд."""
+    bucket = models.DateTimeField('Начало интервала', db_index=True)
+    count = models.PositiveIntegerField('Событий', default=0)
+
+    class Meta:
+        abstract = True
+
+
+class PostActivity(Activity):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+    )
+
+    class Meta:
+        verbose_name = 'Активность поста'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'bucket'],
+                name='unique_post_activity'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'Пост {self.post_id} с {self.bucket}: {self.count}'
+
+
+class GroupActivity(Activity):
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+    )
+
+    class Meta:
+        verbose_name = 'Активность группы'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'bucket'],
+                name='unique_group_activity'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'Группа {self.group_id} с {self.bucket}: {self.count}'
+
+
+class ImageJob(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+    )
+    image = models.CharField('Файл', max_length=100)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField('Взято в работу', null=True, blank=True)
+    finished = models.DateTimeField('Завершено', null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    error = models.TextField('Ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Задача обработки картинки'
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='posts_imagejob_pending_idx',
+                condition=models.Q(finished__isnull=True),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.image} поста {self.post_id}'
+
+
+class ImageVariant(models.Model):
+    source = models.CharField('Исходный файл', max_length=100)
+    format = models.CharField('Формат', max_length=4)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    file = models.CharField('Файл', max_length=255, db_index=True)
+
+    class Meta:
+        verbose_name = 'Вариант картинки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'format', 'width'],
+                name='unique_image_variant'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return self.file
+
+
+class MediaFile(models.Model):
+    name = models.CharField('Файл', max_length=100, unique=True)
+    refs = models.PositiveIntegerField('Ссылок', default=0)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        indexes = [
+            models.Index(
+                fields=['updated'],
+                name='posts_mediafile_orphan_idx',
+                condition=models.Q(refs=0),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.refs})'
@@ -0,0 +1,127 @@
+"""Полнотекстовый поиск по постам и группам на SQLite FTS5.
+
+Для каждой модели из INDEXES есть виртуальная таблица FTS5, строка
+которой хранит копию текстовых полей под rowid, равным pk. Таблицы
+обновляют сигналы save/delete, а расхождения (загрузка фикстур,
+UPDATE в обход save) выравнивает команда rebuild_search.
+Поиск по запросу пользователя находит все его слова, последнее — по
+префиксу. Посты ранжируются по BM25, но если совпадений больше
+SEARCH_RANK_LIMIT, выдаются просто от новых к старым: FTS5 считает
+BM25 для каждого совпадения, а слишком общий запрос от ранжирования
+почти ничего не выигрывает.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Group, Post
+
+INDEXES = {
+    Post: ('posts_post_fts', ('text',)),
+    Group: ('posts_group_fts', ('title', 'description')),
+}
+WORD = re.compile(r'\w+')
+
+
+def match_query(text):
+    """Запрос FTS5 из слов строки; пустая строка, если слов нет."""
+    words = WORD.findall(text or '')
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _values(instance, fields):
+    return [getattr(instance, field) or '' for field in fields]
+
+
+def index(instance):
+    table, fields = INDEXES[type(instance)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {table} (rowid, {", ".join(fields)}) '
+            f'VALUES (%s{", %s" * len(fields)})',
+            [instance.pk, *_values(instance, fields)],
+        )
+
+
+def unindex(model, pk):
+    table, _ = INDEXES[model]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+
+
+def matching(model, text):
+    """Подзапрос pk записей, подходящих под text, для фильтра pk__in."""
+    table, _ = INDEXES[model]
+    return RawSQL(
+        f'SELECT rowid FROM {table} WHERE {table} MATCH %s',
+        [match_query(text)],
+    )
+
+
+class Results:
+    """Найденные посты в порядке релевантности.
+
+    Поддерживает count() и срезы для Paginator: на страницу читаются
+    только её id из индекса и сами посты по первичному ключу.
+    """
+
+    def __init__(self, text):
+        self.query = match_query(text)
+        self._count = None
+
+    def count(self):
+        if not self.query:
+            return 0
+        if self._count is None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT count(*) FROM posts_post_fts '
+                    'WHERE posts_post_fts MATCH %s',
+                    [self.query],
+                )
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.query:
+            return []
+        start = key.start or 0
+        limit = -1 if key.stop is None else key.stop - start
+        ranked = self.count() <= settings.SEARCH_RANK_LIMIT
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM posts_post_fts '
+                'WHERE posts_post_fts MATCH %s '
+                f'ORDER BY {"rank" if ranked else "rowid DESC"} '
+                'LIMIT %s OFFSET %s',
+                [self.query, limit, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.select_related('author').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def rebuild():
+    """Заполняет индексы заново; возвращает число записей по таблицам."""
+    counts = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model, (table, fields) in INDEXES.items():
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(
+                f'INSERT INTO {table} (rowid, {", ".join(fields)}) '
+                f'SELECT id, {", ".join(fields)} '
+                f'FROM {model._meta.db_table}'
+            )
+            counts[table] = model.objects.count()
+    return counts
@@ -0,0 +1,226 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import (
+    autocomplete, caching, counters, feed, follows, groups, images, media,
+    search, tags, trending,
+)
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def push_to_feeds(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.push_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    feed.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_author(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.bump_author(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_author(instance.author_id, 'followers_count', 1)
+        counters.bump_author(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.bump_author(instance.author_id, 'followers_count', -1)
+    counters.bump_author(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_generations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump(*caching.post_scopes(instance))
+        instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_generations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump(caching.scope('post', instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_generations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # В профилях обоих пользователей выводятся счётчики подписок.
+        caching.bump(
+            caching.scope('author', instance.author_id),
+            caching.scope('author', instance.user_id),
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_generations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Название группы выводится и в профилях её авторов.
+        authors = Post.objects.filter(group=instance).order_by().values_list(
+            'author_id', flat=True
+        ).distinct()
+        caching.bump(
+            'posts',
+            caching.scope('group', instance.pk),
+            *(caching.scope('author', author_id) for author_id in authors),
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def touch_group_posts(sender, instance, created=False, raw=False, **kwargs):
+    # Фрагменты статей кэшируются по updated_at и содержат ссылку на группу.
+    if not created and not raw:
+        Post.objects.filter(group=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_groups(sender, raw=False, **kwargs):
+    if not raw:
+        groups.invalidate()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def refresh_follows(sender, instance, raw=False, **kwargs):
+    if not raw:
+        follows.invalidate(instance.user_id)
+        transaction.on_commit(lambda: follows.refresh(instance.user_id))
+
+
+@receiver(post_save, sender=Post)
+def count_media_refs(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    image = instance.image.name or ''
+    previous = '' if created else getattr(instance, '_loaded_image', '')
+    if image != (previous or ''):
+        if previous:
+            media.release(previous)
+        if image:
+            media.acquire(image)
+
+
+@receiver(post_delete, sender=Post)
+def release_media(sender, instance, **kwargs):
+    if instance.image:
+        media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def enqueue_images(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    image = instance.image.name or ''
+    previous = '' if created else getattr(instance, '_loaded_image', '')
+    if image != (previous or ''):
+        images.enqueue(instance)
+    instance._loaded_image = image
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Group)
+def index_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Group)
+def unindex_for_search(sender, instance, **kwargs):
+    search.unindex(sender, instance.pk)
+
+
+@receiver(post_save, sender=User)
+def update_user_suggestions(sender, instance, raw=False, update_fields=None,
+                            **kwargs):
+    # Вход обновляет только last_login: индекс трогать незачем.
+    if raw or (update_fields and 'username' not in update_fields):
+        return
+    autocomplete.user_saved(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_suggestion(sender, instance, **kwargs):
+    autocomplete.user_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def update_group_suggestions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        autocomplete.group_saved(instance)
+
+
+@receiver(post_delete, sender=Group)
+def remove_group_suggestion(sender, instance, **kwargs):
+    autocomplete.group_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def sync_tags(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.text != getattr(instance, '_loaded_text', None):
+        tags.sync(instance, created)
+    instance._loaded_text = instance.text
+
+
+@receiver(pre_delete, sender=Post)
+def release_tags(sender, instance, **kwargs):
+    tags.release(instance)
+
+
+@receiver(post_save, sender=Post)
+def record_post_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.post_created(instance)
+
+
+@receiver(post_save, sender=Comment)
+def record_comment_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.comment_created(instance)
@@ -0,0 +1,48 @@
+"""Хранилище с адресацией по содержимому.
+
+Файл называется SHA-256 своего содержимого, поэтому одинаковые
+загрузки занимают один файл, а содержимое по URL никогда не меняется
+и его можно кэшировать навсегда. Ссылки постов на файлы считает
+модуль media.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Сохраняет файл под именем <каталог>/<xx>/<хэш><расширение>.
+
+    Из исходного имени остаются только каталог и расширение.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        name = os.path.join(directory, digest[:2], digest + extension)
+        if self.exists(name):
+            # Отметка времени откладывает удаление файла без ссылок:
+            # загрузка сошлётся на него чуть позже.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
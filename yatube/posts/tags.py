@@ -0,0 +1,74 @@
+"""Хештеги в тексте постов.
+
+Теги разбираются из текста при каждом сохранении поста, в котором
+текст изменился, и хранятся в Tag и связях PostTag. Связь хранит копию
+pub_date, поэтому лента тега читается по индексу (tag, -pub_date) без
+сортировки, как ленты подписок. Tag.posts_count меняется атомарными
+UPDATE вместе со связями, а расхождения выравнивает команда
+reconcile_counters.
+"""
+import re
+
+from django.db.models import F
+
+from .feed import Timeline
+from .models import PostTag, Tag
+
+TAG = re.compile(r'(?<![\w#&])#(\w+)')
+MAX_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def extract(text):
+    """Имена тегов текста в порядке появления, без повторов."""
+    return list(dict.fromkeys(
+        name.casefold() for name in TAG.findall(text or '')
+        if len(name) <= MAX_LENGTH
+    ))
+
+
+def sync(post, created=False):
+    """Приводит теги поста к тексту; возвращает, менялись ли они."""
+    names = set(extract(post.text))
+    current = {} if created else dict(
+        PostTag.objects.filter(post=post).values_list('tag__name', 'tag_id')
+    )
+    removed = [current[name] for name in current.keys() - names]
+    added = names - current.keys()
+    if removed:
+        PostTag.objects.filter(post=post, tag_id__in=removed).delete()
+        Tag.objects.filter(pk__in=removed, posts_count__gt=0).update(
+            posts_count=F('posts_count') - 1
+        )
+    if added:
+        Tag.objects.bulk_create(
+            (Tag(name=name) for name in added), ignore_conflicts=True
+        )
+        tag_ids = list(Tag.objects.filter(name__in=added).values_list(
+            'pk', flat=True
+        ))
+        PostTag.objects.bulk_create(
+            (
+                PostTag(post=post, tag_id=tag_id, pub_date=post.pub_date)
+                for tag_id in tag_ids
+            ),
+            ignore_conflicts=True,
+        )
+        Tag.objects.filter(pk__in=tag_ids).update(
+            posts_count=F('posts_count') + 1
+        )
+    return bool(removed or added)
+
+
+def release(post):
+    """Уменьшает счётчики тегов удаляемого поста."""
+    Tag.objects.filter(
+        pk__in=PostTag.objects.filter(post=post).values('tag_id'),
+        posts_count__gt=0,
+    ).update(posts_count=F('posts_count') - 1)
+
+
+def timeline(tag):
+    """Посты тега для pagination."""
+    return Timeline(PostTag.objects.filter(tag=tag).select_related(
+        'post__author'
+    ).order_by('-pub_date', 'post_id'))
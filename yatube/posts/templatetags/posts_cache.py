@@ -0,0 +1,70 @@
+from django import template
+from django.conf import settings
+from django.core.cache.utils import make_template_fragment_key
+
+from posts import caching, groups
+
+register = template.Library()
+
+
+@register.filter
+def scope(name, value):
+    return caching.scope(name, value)
+
+
+@register.simple_tag
+def fragment_timeout():
+    """Срок жизни для {% cache %} фрагментов с версией в ключе."""
+    return settings.FRAGMENT_CACHE_TIMEOUT
+
+
+@register.filter
+def group(group_id):
+    """Группа по id из реестра групп, без запроса к базе."""
+    return groups.get_by_id(group_id)
+
+
+class GenerationCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, scope, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.scope = scope
+        self.vary_on = vary_on
+
+    def render(self, context):
+        generation = caching.generation(self.scope.resolve(context))
+        cache_key = make_template_fragment_key(
+            self.fragment_name, [var.resolve(context) for var in self.vary_on]
+        )
+        rendered = []
+
+        def compute():
+            rendered.append(True)
+            return self.nodelist.render(context)
+
+        # Поколение хранится в записи, а не в ключе: после сброса
+        # остальные запросы отдают прежний фрагмент, пока один рендерит.
+        value = caching.get_or_set(cache_key, compute, version=generation)
+        caching.record(self.fragment_name, not rendered)
+        return value
+
+
+@register.tag
+def gencache(parser, token):
+    """Кэширует фрагмент бессрочно до смены поколения области.
+
+    {% gencache fragment_name scope [var1] [var2] .. %}
+    """
+    nodelist = parser.parse(('endgencache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'"{tokens[0]}" tag requires at least 2 arguments.'
+        )
+    return GenerationCacheNode(
+        nodelist,
+        tokens[1],
+        parser.compile_filter(tokens[2]),
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
@@ -0,0 +1,26 @@
+from django import template
+
+from posts import images
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/picture.html', takes_context=True)
+def responsive_image(context, post, sizes='100vw'):
+    """Адаптивная картинка поста или заглушка, пока варианты не готовы.
+
+    В списках картинки всей страницы page_obj читаются одной пачкой.
+    """
+    picture = None
+    if post.image and post.image_ready:
+        page = context.get('page_obj')
+        found = images.page_pictures(page) if page is not None else {}
+        source = post.image.name
+        picture = found[source] if source in found else images.picture(
+            source
+        )
+    return {
+        'post': post,
+        'picture': picture,
+        'sizes': sizes,
+    }
@@ -0,0 +1,29 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from posts import tags
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def hashtags(text, autoescape=True):
+    """Текст поста со ссылками на ленты его тегов."""
+    escape = conditional_escape if autoescape else str
+    parts = []
+    position = 0
+    for match in tags.TAG.finditer(text):
+        name = match.group(1)
+        if len(name) > tags.MAX_LENGTH:
+            continue
+        parts.append(escape(text[position:match.start()]))
+        parts.append(format_html(
+            '<a href="{}">#{}</a>',
+            reverse('posts:tag_posts', args=[name.casefold()]),
+            name,
+        ))
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
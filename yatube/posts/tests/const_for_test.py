@@ -26,6 +26,8 @@ TEST_GIF = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+# Та же картинка другого цвета: другой хэш содержимого.
+TEST_ANOTHER_GIF = TEST_GIF.replace(b'\xFF\xFF\xFF', b'\xFF\x00\x00')
 
 INDEX_ROUTE = 'posts:index'
 USERNAME_ROUTE = 'posts:profile'
@@ -35,9 +37,13 @@ POST_CREATE_ROUTE = 'posts:post_create'
 LOGIN_ROUTE = 'users:login'
 GROUP_LIST_ROUTE = 'posts:group_list'
 COMMENT_ROUTE = 'posts:add_comment'
+COMMENTS_ROUTE = 'posts:post_comments'
 FOLLOW_ROUTE = 'posts:follow_index'
 UNFOLLOW_ROUTE = 'posts:profile_unfollow'
 PROFILE_FOLLOW_ROUTE = 'posts:profile_follow'
+SEARCH_ROUTE = 'posts:search'
+TAG_ROUTE = 'posts:tag_posts'
+TEST_TAG = 'тег'
 CREATE_REDIRECT_URL = '/auth/login/?next=/create/'
 UNKNOWN_URL = '/unknown/'
 
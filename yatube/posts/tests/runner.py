@@ -0,0 +1,36 @@
+"""Тесты работают с отдельным временным файлом общего кэша.
+
+Иначе cache.clear() в тестах стирал бы кэш запущенного dev-сервера,
+а состояние кэша переходило бы от прогона к прогону.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextmanager
+def temporary_cache():
+    directory = tempfile.mkdtemp()
+    caches = {alias: dict(config) for alias, config in settings.CACHES.items()}
+    caches['shared']['LOCATION'] = os.path.join(directory, 'cache.sqlite3')
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache = temporary_cache()
+        self._cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,109 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import autocomplete, caching
+from posts.autocomplete import PrefixIndex
+from posts.models import Group, User
+from .const_for_test import (
+    TEST_AUTHOR, ANOTHER_AUTHOR, TEST_GROUP, TEST_SLUG, TEST_DESCRIPTION
+)
+
+AUTOCOMPLETE_URL = reverse('posts:autocomplete')
+
+
+class PrefixIndexTests(TestCase):
+    def test_search(self):
+        """Поиск по префиксу без учёта регистра, в порядке ключей."""
+        index = PrefixIndex([(1, 'Bob'), (2, 'alice'), (3, 'bobby')])
+        self.assertEqual(index.search('BO', 10), [1, 3])
+        self.assertEqual(index.search('bo', 1), [1])
+        self.assertEqual(index.search('c', 10), [])
+        index.add(1, 'carol')
+        index.remove(3)
+        self.assertEqual(index.search('bo', 10), [])
+        self.assertEqual(index.search('c', 10), [1])
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP, slug=TEST_SLUG, description=TEST_DESCRIPTION
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def suggest(self, prefix):
+        return self.guest_client.get(AUTOCOMPLETE_URL, {'q': prefix}).json()
+
+    def test_suggestions(self):
+        """Подсказки по имени пользователя, slug и названию группы
+        отдаются из памяти без запросов к базе."""
+        autocomplete.suggest('')
+        with self.assertNumQueries(0):
+            data = self.suggest(TEST_AUTHOR[:3].upper())
+            self.assertEqual(data['users'], [{'username': TEST_AUTHOR}])
+            group = {'slug': TEST_SLUG, 'title': TEST_GROUP}
+            self.assertEqual(self.suggest(TEST_SLUG[:2])['groups'], [group])
+            self.assertEqual(self.suggest(TEST_GROUP[:2])['groups'], [group])
+
+    def test_signals_update_index(self):
+        """Изменения пользователей и групп видны сразу и без
+        перечитывания индекса."""
+        autocomplete.suggest('')
+        user = User.objects.create_user(username=ANOTHER_AUTHOR)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                autocomplete.suggest(ANOTHER_AUTHOR)['users'],
+                [{'username': ANOTHER_AUTHOR}],
+            )
+            self.assertEqual(autocomplete.suggest(TEST_SLUG)['groups'], [])
+            self.assertEqual(
+                len(autocomplete.suggest('renamed')['groups']), 1
+            )
+        user.delete()
+        self.assertEqual(autocomplete.suggest(ANOTHER_AUTHOR)['users'], [])
+
+    def test_login_keeps_index(self):
+        """Вход пользователя не сбрасывает индекс."""
+        autocomplete.suggest('')
+        generation = caching.generation(autocomplete.SCOPE)
+        self.user.set_password('password')
+        self.user.save()
+        self.guest_client.login(username=TEST_AUTHOR, password='password')
+        self.assertEqual(
+            caching.generation(autocomplete.SCOPE), generation
+        )
+
+    def test_reloads_after_foreign_change(self):
+        """Если индекс менял другой процесс, он перечитывается."""
+        autocomplete.suggest('')
+        # Другой процесс: сигналы этого процесса не срабатывают.
+        User.objects.bulk_create([User(username=ANOTHER_AUTHOR)])
+        caching.bump(autocomplete.SCOPE)
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                autocomplete.suggest(ANOTHER_AUTHOR)['users'],
+                [{'username': ANOTHER_AUTHOR}],
+            )
+
+    def test_save_does_not_reload_stale_index(self):
+        """Сохранение пользователя при устаревшем индексе только
+        помечает его, а перечитывает уже следующее чтение."""
+        autocomplete.suggest('')
+        User.objects.bulk_create([User(username=ANOTHER_AUTHOR)])
+        caching.bump(autocomplete.SCOPE)
+        User.objects.filter(pk=self.user.pk).update(username='renamed')
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            autocomplete.user_saved(user)
+        users = autocomplete.suggest('')['users']
+        self.assertIn({'username': 'renamed'}, users)
+        self.assertIn({'username': ANOTHER_AUTHOR}, users)
@@ -0,0 +1,167 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from posts.cache_backends import SQLiteCache, TieredCache
+
+TEMP_DIR = tempfile.mkdtemp()
+SHARED = {
+    'BACKEND': 'posts.cache_backends.SQLiteCache',
+    'LOCATION': os.path.join(TEMP_DIR, 'cache.sqlite3'),
+}
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+def tiered(location):
+    return TieredCache(location, {
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 2,
+            'SYNC_INTERVAL': 0,
+        },
+    })
+
+
+@override_settings(CACHES={'default': SHARED, 'shared': SHARED})
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = SQLiteCache(
+            SHARED['LOCATION'], {'OPTIONS': {'MAX_ENTRIES': 10}}
+        )
+        self.cache.clear()
+
+    def test_add_is_exclusive(self):
+        """add не перезаписывает живой ключ, но занимает истёкший."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache.set('key', 1, timeout=-1)
+        self.assertTrue(self.cache.add('key', 3))
+
+    def test_incr(self):
+        """incr атомарно меняет значение и падает на отсутствующем ключе."""
+        self.cache.set('key', 1)
+        self.assertEqual(self.cache.incr('key', 2), 3)
+        self.assertEqual(self.cache.get('key'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_get_many_and_cull(self):
+        """get_many пропускает истёкшие ключи, объём ограничен MAX_ENTRIES."""
+        self.cache.set('alive', 1)
+        self.cache.set('expired', 2, timeout=-1)
+        self.assertEqual(
+            self.cache.get_many(['alive', 'expired', 'missing']),
+            {'alive': 1},
+        )
+        for i in range(20):
+            self.cache.set(f'key-{i}', i)
+        self.assertLessEqual(self.cache.stats()['entries'], 10)
+
+    def test_cull_keeps_recent_entries_with_timeout(self):
+        """Вытесняются давно записанные ключи, а не свежие со сроком."""
+        for i in range(12):
+            self.cache.set(f'key-{i}', i, None)
+        self.assertTrue(self.cache.add('lock', True, 10))
+        self.cache.set('journal', 'key-0', 600)
+        self.cache.set('key-12', 12, None)
+        self.assertTrue(self.cache.get('lock'))
+        self.assertEqual(self.cache.get('journal'), 'key-0')
+        self.assertIsNone(self.cache.get('key-0'))
+
+    def test_incr_counts_as_recent_write(self):
+        """Изменённый incr счётчик не вытесняется как старый."""
+        self.cache.set('counter', 1, None)
+        for i in range(9):
+            self.cache.set(f'key-{i}', i, None)
+        self.cache.incr('counter')
+        self.cache.set('key-9', 9, None)
+        self.assertEqual(self.cache.get('counter'), 2)
+
+
+@override_settings(CACHES={'default': SHARED, 'shared': SHARED})
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.first = tiered('first')
+        self.second = tiered('second')
+        self.first.clear()
+        self.second.clear()
+
+    def test_local_hit_skips_shared(self):
+        """Повторное чтение обслуживает LRU процесса."""
+        self.first.set('key', 1)
+        with mock.patch.object(
+            SQLiteCache, 'get', side_effect=AssertionError
+        ) as shared_get, mock.patch.object(
+            self.first, '_sync'
+        ):
+            self.assertEqual(self.first.get('key'), 1)
+        shared_get.assert_not_called()
+        self.assertGreater(self.first.local_stats()['local_hits'], 0)
+
+    def test_invalidation_reaches_other_process(self):
+        """Запись одного процесса выбрасывает ключ из LRU другого."""
+        self.first.set('key', 1)
+        self.assertEqual(self.second.get('key'), 1)
+        self.first.set('key', 2)
+        self.assertEqual(self.second.get('key'), 2)
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_lost_journal_clears_local_tier(self):
+        """При потере журнала уровень процесса очищается целиком."""
+        self.first.set('key', 1)
+        self.second.get('key')
+        caches['shared'].set('key', 2)
+        self.first.set('other', 1)
+        caches['shared'].delete('tiered:journal:2')
+        self.assertEqual(self.second.get('key'), 2)
+
+    def test_lru_is_bounded(self):
+        """В LRU не больше MAX_ENTRIES записей, объём учитывается."""
+        for i in range(5):
+            self.first.set(f'key-{i}', i)
+        stats = self.first.local_stats()
+        self.assertEqual(stats['local_entries'], 2)
+        self.assertGreater(stats['local_bytes'], 0)
+        self.assertEqual(self.first.get('key-0'), 0)
+        self.assertEqual(
+            self.first.local_stats()['shared_hits'], stats['shared_hits'] + 1
+        )
+
+    def test_local_timeout(self):
+        """Значения в LRU живут не дольше LOCAL_TIMEOUT."""
+        self.first.set('key', 1)
+        caches['shared'].set('key', 2)
+        with mock.patch.object(self.first, '_sync'):
+            self.assertEqual(self.first.get('key'), 1)
+            with mock.patch(
+                'posts.cache_backends.time.time',
+                return_value=time.time() + 10,
+            ):
+                self.assertEqual(self.first.get('key'), 2)
+
+    def test_stats_are_published(self):
+        """Статистика процессов доступна через общий уровень."""
+        self.first.get('key')
+        stats = self.first.stats()
+        self.assertIn(os.getpid(), stats['processes'])
+        self.assertIn('entries', stats['shared'])
+
+
+class TestCacheLocationTests(SimpleTestCase):
+    def test_tests_use_temporary_file(self):
+        """Тесты не трогают файл кэша dev-сервера."""
+        self.assertNotEqual(
+            caches['shared']._path, settings.CACHE_FILE
+        )
@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from posts import caching
+
+KEY = 'test-key'
+
+
+class GetOrSetTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_fresh_value_is_reused(self):
+        """Свежее значение не пересчитывается."""
+        caching.get_or_set(KEY, self.compute, timeout=60, beta=0)
+        self.assertEqual(
+            caching.get_or_set(KEY, self.compute, timeout=60, beta=0), 1
+        )
+
+    def test_new_version_recomputes(self):
+        """Смена поколения приводит к пересчёту."""
+        caching.get_or_set(KEY, self.compute, version=1)
+        self.assertEqual(
+            caching.get_or_set(KEY, self.compute, version=2), 2
+        )
+
+    def test_stale_value_while_locked(self):
+        """Пока пересчёт заблокирован, отдаётся прежнее значение."""
+        caching.get_or_set(KEY, self.compute, version=1)
+        cache.add(caching.LOCK_KEY.format(KEY), True)
+        self.assertEqual(
+            caching.get_or_set(KEY, self.compute, version=2), 1
+        )
+        self.assertEqual(self.calls, 1)
+
+    def test_no_stale_value_computes(self):
+        """Без прежнего значения вычисляет и тот, кто не взял блокировку."""
+        cache.add(caching.LOCK_KEY.format(KEY), True)
+        self.assertEqual(caching.get_or_set(KEY, self.compute), 1)
+
+    def test_expired_value_within_grace(self):
+        """Истёкшее значение хранится ещё CACHE_GRACE секунд."""
+        with mock.patch('posts.caching.time.time', return_value=1000):
+            caching.get_or_set(KEY, self.compute, timeout=10)
+        cache.add(caching.LOCK_KEY.format(KEY), True)
+        with mock.patch('posts.caching.time.time', return_value=1020):
+            self.assertEqual(
+                caching.get_or_set(KEY, self.compute, timeout=10), 1
+            )
+
+    def test_early_expiry(self):
+        """Значение обновляется досрочно с вероятностью по XFetch."""
+        # Пересчёт занимал секунду, до срока осталась секунда.
+        with mock.patch('posts.caching.time.time', return_value=1000):
+            cache.set(KEY, (0, None, 1001, 1.0))
+            with mock.patch('posts.caching.random.random', return_value=0):
+                self.assertEqual(caching.get_or_set(KEY, self.compute), 0)
+            with mock.patch('posts.caching.random.random', return_value=.9):
+                self.assertEqual(caching.get_or_set(KEY, self.compute), 1)
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+from posts.utils import COMMENTS_COUNT
+from .const_for_test import (
+    TEST_AUTHOR, ANOTHER_AUTHOR, TEST_TEXT, DETAIL_ROUTE, COMMENTS_ROUTE
+)
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.commenter = User.objects.create_user(username=ANOTHER_AUTHOR)
+        cls.post = Post.objects.create(text=TEST_TEXT, author=cls.user)
+        # Одно и то же время создания у части комментариев проверяет,
+        # что курсор различает их по pk.
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.commenter, text=f'Ответ {i}')
+            for i in range(COMMENTS_COUNT + 5)
+        )
+        Post.objects.filter(pk=cls.post.pk).update(
+            comments_count=COMMENTS_COUNT + 5
+        )
+        cls.detail_url = reverse(DETAIL_ROUTE, kwargs={'post_id': cls.post.pk})
+        cls.fragment_url = reverse(
+            COMMENTS_ROUTE, kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_detail_shows_first_page(self):
+        """На странице поста первая страница комментариев и ссылка на
+        следующую; счётчик берётся из поста."""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_COUNT)
+        self.assertTrue(comments.has_next())
+        self.assertContains(
+            response, f'{self.fragment_url}?cursor={comments.next_cursor}'
+        )
+        self.assertContains(response, f'<span >{COMMENTS_COUNT + 5}</span>')
+
+    def test_fragment_continues_without_gaps(self):
+        """Фрагмент отдаёт оставшиеся комментарии без повторов."""
+        first = self.client.get(self.detail_url).context['comments']
+        response = self.client.get(
+            self.fragment_url, {'cursor': first.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        rest = response.context['comments']
+        self.assertFalse(rest.has_next())
+        self.assertNotContains(response, 'data-fragment')
+        self.assertEqual(
+            [comment.pk for comment in [*first, *rest]],
+            list(
+                Comment.objects.filter(post=self.post)
+                .order_by('-created', 'pk').values_list('pk', flat=True)
+            ),
+        )
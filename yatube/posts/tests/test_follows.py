@@ -0,0 +1,62 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Follow, User
+from .const_for_test import (
+    TEST_AUTHOR, ANOTHER_AUTHOR, TEST_GROUP, PROFILE_FOLLOW_ROUTE,
+    UNFOLLOW_ROUTE
+)
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.author = User.objects.create_user(username=ANOTHER_AUTHOR)
+        cls.other = User.objects.create_user(username=TEST_GROUP)
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_bulk_states_in_one_query(self):
+        """Состояние подписок на список авторов — один запрос, затем ноль."""
+        authors = [self.author.pk, self.other.pk]
+        expected = {self.author.pk: True, self.other.pk: False}
+        with self.assertNumQueries(1):
+            states = follows.follow_states(self.user, authors)
+        self.assertEqual(states, expected)
+        with self.assertNumQueries(0):
+            states = follows.follow_states(self.user, authors)
+            self.assertTrue(follows.is_following(self.user, self.author.pk))
+        self.assertEqual(states, expected)
+
+    def test_anonymous(self):
+        """Аноним ни на кого не подписан, запросов нет."""
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                follows.is_following(AnonymousUser(), self.author.pk)
+            )
+
+    def test_follow_views_update_graph(self):
+        """Подписка и отписка сразу меняют кэшированный граф."""
+        follows.following_ids(self.user.pk)
+        self.authorized_client.get(
+            reverse(PROFILE_FOLLOW_ROUTE, kwargs={'username': TEST_GROUP})
+        )
+        self.assertTrue(follows.is_following(self.user, self.other.pk))
+        self.authorized_client.get(
+            reverse(UNFOLLOW_ROUTE, kwargs={'username': ANOTHER_AUTHOR})
+        )
+        self.assertFalse(follows.is_following(self.user, self.author.pk))
+
+    def test_stale_entry_is_recomputed(self):
+        """Множество, прочитанное до смены поколения, не используется."""
+        follows.following_ids(self.user.pk)
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(follows.following_ids(self.user.pk), frozenset())
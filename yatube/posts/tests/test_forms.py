@@ -1,11 +1,14 @@
+import hashlib
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from posts import tags
 from posts.forms import PostForm
 from posts.models import Group, Post, User, Comment
 from .const_for_test import (
@@ -103,7 +106,8 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post.text, form_data[TEXT])
         self.assertEqual(post.group.pk, form_data[GROUP])
         self.assertTrue(post.image)
-        self.assertEqual(post.image, 'posts/small.gif')
+        digest = hashlib.sha256(small_gif).hexdigest()
+        self.assertEqual(post.image, f'posts/{digest[:2]}/{digest}.gif')
 
     def test_post_edit_form(self):
         """Валидная форма при редактировании меняет связанный пост."""
@@ -122,6 +126,18 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post.text, form_data[TEXT])
         self.assertEqual(post.group.pk, form_data[GROUP])
 
+    def test_post_edit_is_atomic(self):
+        """Сбой в обработчиках сохранения откатывает всю правку."""
+        with mock.patch.object(tags, 'sync', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.authorized_client.post(
+                    self.EDIT_URL,
+                    data={GROUP: self.group.pk, TEXT: TEST_ANOTHER_TEXT},
+                )
+        self.assertEqual(
+            Post.objects.get(pk=self.original_post.pk).text, TEST_TEXT
+        )
+
     def test_post_create_by_guest_form(self):
         """Гость не может создать запись в Post."""
         posts_count = Post.objects.count()
@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+
+from posts import groups
+from posts.models import Group
+from .const_for_test import (
+    TEST_GROUP, TEST_SLUG, TEST_DESCRIPTION, TEST_ANOTHER_GROUP,
+    TEST_ANOTHER_SLUG
+)
+
+
+class GroupRegistryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(
+            title=TEST_GROUP,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lookups_are_cached(self):
+        """После загрузки реестр отвечает без запросов, в том числе
+        для несуществующего slug."""
+        with self.assertNumQueries(1):
+            self.assertEqual(groups.get(TEST_SLUG), self.group)
+        with self.assertNumQueries(0):
+            self.assertEqual(groups.get_by_id(self.group.pk), self.group)
+            self.assertIsNone(groups.get(TEST_ANOTHER_SLUG))
+            with self.assertRaises(Http404):
+                groups.get_or_404(TEST_ANOTHER_SLUG)
+
+    def test_signals_invalidate(self):
+        """Создание и изменение групп сразу видны в реестре."""
+        groups.get(TEST_SLUG)
+        other = Group.objects.create(
+            title=TEST_ANOTHER_GROUP, slug=TEST_ANOTHER_SLUG
+        )
+        self.assertEqual(groups.get(TEST_ANOTHER_SLUG), other)
+        other.title = TEST_GROUP
+        other.save()
+        self.assertEqual(groups.get(TEST_ANOTHER_SLUG).title, TEST_GROUP)
+        other.delete()
+        self.assertIsNone(groups.get(TEST_ANOTHER_SLUG))
@@ -0,0 +1,182 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import images
+from posts.models import ImageJob, ImageVariant, Post, User
+from .const_for_test import (
+    TEST_AUTHOR, TEST_TEXT, TEST_GIF, TEST_ANOTHER_GIF, DETAIL_ROUTE
+)
+from .utils import upload
+
+IMAGE_TAG = '<img class="card-img'
+EXIF_ORIENTATION = 0x0112
+ROTATED_90 = 6
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_worker_prepares_thumbnails(self):
+        """Пока воркер не отработал, вместо картинки выводится заглушка."""
+        post = Post.objects.create(
+            text=TEST_TEXT, author=self.user, image=upload()
+        )
+        url = reverse(DETAIL_ROUTE, kwargs={'post_id': post.pk})
+        self.assertEqual(
+            ImageJob.objects.filter(post=post, finished=None).count(), 1
+        )
+        self.assertNotContains(self.guest_client.get(url), IMAGE_TAG)
+        call_command('process_images', '--once', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.image_ready)
+        self.assertContains(self.guest_client.get(url), IMAGE_TAG)
+
+    def test_exif_orientation_is_applied(self):
+        """Размеры и варианты считаются после поворота по EXIF."""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = ROTATED_90
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20)).save(
+            buffer, 'JPEG', exif=exif.tobytes()
+        )
+        name = default_storage.save('rotated.jpg', buffer)
+        fields, _ = images.render_variants(name)
+        self.assertEqual(
+            (fields['image_width'], fields['image_height']), (20, 40)
+        )
+
+    def test_variants_registry(self):
+        """Варианты создаются в каждом доступном формате и выводятся в
+        srcset."""
+        post = Post.objects.create(
+            text=TEST_TEXT, author=self.user, image=upload()
+        )
+        images.work()
+        formats = images.supported_formats()
+        self.assertIn('JPEG', formats)
+        variants = ImageVariant.objects.filter(source=post.image.name)
+        self.assertEqual(
+            set(variants.values_list('format', flat=True)), set(formats)
+        )
+        for variant in variants:
+            self.assertTrue(default_storage.exists(variant.file))
+        response = self.guest_client.get(
+            reverse(DETAIL_ROUTE, kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, 'srcset="')
+        self.assertContains(response, f'width="{images.WIDTHS[0]}"')
+
+    def test_replaced_image_supersedes_job(self):
+        """Задача для заменённой картинки закрывается без обработки."""
+        post = Post.objects.create(
+            text=TEST_TEXT, author=self.user, image=upload()
+        )
+        post = Post.objects.get(pk=post.pk)
+        post.image = upload('other.gif', TEST_ANOTHER_GIF)
+        post.save()
+        self.assertEqual(images.work(), 2)
+        post.refresh_from_db()
+        self.assertTrue(post.image_ready)
+        self.assertEqual(ImageJob.objects.filter(error='').count(), 2)
+
+    def test_broken_image_fails_after_retries(self):
+        """Битая картинка после MAX_ATTEMPTS попыток помечается ошибкой."""
+        post = Post.objects.create(
+            text=TEST_TEXT,
+            author=self.user,
+            image=upload('broken.gif', b'not an image'),
+        )
+        with self.assertLogs(level='ERROR'):
+            for _ in range(images.MAX_ATTEMPTS):
+                images.work()
+        job = ImageJob.objects.get(post=post)
+        self.assertEqual(job.attempts, images.MAX_ATTEMPTS)
+        self.assertIsNotNone(job.finished)
+        self.assertNotEqual(job.error, '')
+        post.refresh_from_db()
+        self.assertFalse(post.image_ready)
+
+    def rebuild(self, *args):
+        call_command(
+            'rebuild_images', '--chunk-size', '2', '--workers', '1',
+            '--checkpoint', self.checkpoint, *args, stdout=StringIO(),
+        )
+
+    @property
+    def checkpoint(self):
+        return os.path.join(TEMP_MEDIA_ROOT, 'rebuild.checkpoint')
+
+    def test_rebuild_command(self):
+        """Команда пересоздаёт варианты всех постов и удаляет
+        контрольную точку."""
+        posts = [
+            Post.objects.create(
+                text=TEST_TEXT, author=self.user, image=upload(content=gif)
+            )
+            for gif in (TEST_GIF, TEST_ANOTHER_GIF, TEST_GIF)
+        ]
+        self.rebuild()
+        for post in posts:
+            post.refresh_from_db()
+            self.assertTrue(post.image_ready)
+            self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(
+            ImageVariant.objects.values('source').distinct().count(), 2
+        )
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_rebuild_resumes_from_checkpoint(self):
+        """Посты до контрольной точки не обрабатываются."""
+        first, second = (
+            Post.objects.create(
+                text=TEST_TEXT, author=self.user, image=upload(content=gif)
+            )
+            for gif in (TEST_GIF, TEST_ANOTHER_GIF)
+        )
+        with open(self.checkpoint, 'w') as file:
+            file.write(str(first.pk))
+        self.rebuild()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertFalse(first.image_ready)
+        self.assertTrue(second.image_ready)
+
+    def test_rebuild_checkpoint_setting(self):
+        """По умолчанию контрольная точка берётся из
+        IMAGE_REBUILD_CHECKPOINT, вне дерева исходников."""
+        self.assertFalse(
+            settings.IMAGE_REBUILD_CHECKPOINT.startswith(settings.BASE_DIR)
+        )
+        post = Post.objects.create(
+            text=TEST_TEXT, author=self.user, image=upload()
+        )
+        with open(self.checkpoint, 'w') as file:
+            file.write(str(post.pk))
+        out = StringIO()
+        with override_settings(IMAGE_REBUILD_CHECKPOINT=self.checkpoint):
+            call_command('rebuild_images', '--workers', '1', stdout=out)
+        self.assertIn(f'Продолжаем после поста {post.pk}', out.getvalue())
@@ -0,0 +1,84 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.views import media as serve_media
+from posts import images, media
+from posts.models import ImageVariant, MediaFile, Post, User
+from .const_for_test import TEST_AUTHOR, TEST_TEXT
+from .utils import upload
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, name='small.gif'):
+        return Post.objects.create(
+            text=TEST_TEXT, author=self.user, image=upload(name)
+        )
+
+    def refs(self, name):
+        return MediaFile.objects.get(name=name).refs
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые загрузки делят один файл и его варианты."""
+        first = self.create()
+        second = self.create('copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refs(first.image.name), 2)
+        images.work()
+        variants = ImageVariant.objects.filter(source=first.image.name)
+        self.assertEqual(
+            variants.count(), len(images.supported_formats())
+        )
+        for variant in variants:
+            self.assertTrue(default_storage.exists(variant.file))
+
+    def test_file_collected_without_refs(self):
+        """Файл удаляется только после удаления последней ссылки."""
+        first = self.create()
+        second = self.create()
+        name = first.image.name
+        images.work()
+        files = list(ImageVariant.objects.values_list('file', flat=True))
+        first.delete()
+        self.assertEqual(media.collect(0), 0)
+        self.assertTrue(default_storage.exists(name))
+        second.delete()
+        self.assertEqual(media.collect(), 0)
+        self.assertEqual(media.collect(0), 1)
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(ImageVariant.objects.exists())
+        for file in files:
+            self.assertFalse(default_storage.exists(file))
+
+    def test_reconcile(self):
+        """Команда collect_media выравнивает счётчики ссылок."""
+        post = self.create()
+        MediaFile.objects.update(refs=5)
+        call_command('collect_media', stdout=StringIO())
+        self.assertEqual(self.refs(post.image.name), 1)
+
+    def test_immutable_cache_headers(self):
+        """Медиафайлы отдаются с бессрочным кэшированием."""
+        post = self.create()
+        request = RequestFactory().get(post.image.url)
+        response = serve_media(
+            request, post.image.name, document_root=TEMP_MEDIA_ROOT
+        )
+        self.assertIn('immutable', response['Cache-Control'])
@@ -1,6 +1,11 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, Comment, Follow, User, SLICE_TEXT
+from ..models import (
+    AuthorStats, Group, Post, Comment, Follow, User, SLICE_TEXT
+)
 from .const_for_test import (
     TEST_AUTHOR, TEST_GROUP, TEST_SLUG, TEST_DESCRIPTION, TEST_TEXT,
     ANOTHER_AUTHOR, TEST_ANOTHER_TEXT
@@ -52,3 +57,53 @@ class PostModelTest(TestCase):
             f'{expected_user} подписан на {expected_author}',
             str(follow)
         )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.reader = User.objects.create_user(username=ANOTHER_AUTHOR)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.user, text=TEST_TEXT)
+        Comment.objects.create(post=post, author=self.reader, text=TEST_TEXT)
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_post_save_keeps_comments_count(self):
+        """Сохранение устаревшего экземпляра не затирает счётчик."""
+        post = Post.objects.create(author=self.user, text=TEST_TEXT)
+        Comment.objects.create(post=post, author=self.reader, text=TEST_TEXT)
+        post.text = TEST_ANOTHER_TEXT
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.text, TEST_ANOTHER_TEXT)
+
+    def test_reconcile_counters_command(self):
+        """reconcile_counters исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.user, text=TEST_TEXT)
+        Comment.objects.create(post=post, author=self.reader, text=TEST_TEXT)
+        AuthorStats.objects.filter(user=self.user).update(posts_count=42)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
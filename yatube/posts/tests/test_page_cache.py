@@ -0,0 +1,252 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.test.signals import template_rendered
+from django.urls import reverse
+
+from posts import cache_backends, caching, middleware
+from posts.models import Comment, Follow, Group, Post, User
+from .const_for_test import (
+    TEST_AUTHOR, ANOTHER_AUTHOR, TEST_GROUP, TEST_SLUG, TEST_DESCRIPTION,
+    TEST_TEXT, TEST_ANOTHER_TEXT, TEST_ANOTHER_GROUP, INDEX_ROUTE,
+    GROUP_LIST_ROUTE, USERNAME_ROUTE, DETAIL_ROUTE
+)
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.author = User.objects.create_user(username=ANOTHER_AUTHOR)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            text=TEST_TEXT, author=cls.author, group=cls.group
+        )
+        cls.INDEX_URL = reverse(INDEX_ROUTE)
+        cls.GROUP_LIST_URL = reverse(
+            GROUP_LIST_ROUTE, kwargs={'slug': TEST_SLUG}
+        )
+        cls.USERNAME_URL = reverse(
+            USERNAME_ROUTE, kwargs={'username': ANOTHER_AUTHOR}
+        )
+        cls.POST_DETAIL_URL = reverse(
+            DETAIL_ROUTE, kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def warm(self, url):
+        # Первый ответ запоминает ключи страницы, второй попадает в кэш.
+        self.guest_client.get(url)
+        return self.guest_client.get(url)
+
+    def test_hit_without_queries(self):
+        """Повторный анонимный запрос отдаётся из кэша без запросов к БД."""
+        for url in (
+            self.INDEX_URL,
+            self.GROUP_LIST_URL,
+            self.USERNAME_URL,
+            self.POST_DETAIL_URL,
+        ):
+            with self.subTest(url=url):
+                first = self.warm(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+
+    def test_authenticated_not_cached(self):
+        """Ответы авторизованным пользователям не кэшируются."""
+        client = Client()
+        client.force_login(self.user)
+        lookups = caching.hits['page'] + caching.misses['page']
+        client.get(self.INDEX_URL)
+        client.get(self.INDEX_URL)
+        self.assertEqual(
+            caching.hits['page'] + caching.misses['page'], lookups
+        )
+
+    def test_post_write_purges_pages(self):
+        """Правка поста сбрасывает главную, группу, профиль и пост."""
+        urls = (
+            self.INDEX_URL,
+            self.GROUP_LIST_URL,
+            self.USERNAME_URL,
+            self.POST_DETAIL_URL,
+        )
+        for url in urls:
+            self.warm(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = TEST_ANOTHER_TEXT
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), TEST_ANOTHER_TEXT
+                )
+
+    def test_comment_purges_only_post(self):
+        """Комментарий сбрасывает страницу поста, но не главную."""
+        self.warm(self.INDEX_URL)
+        self.warm(self.POST_DETAIL_URL)
+        Comment.objects.create(
+            post=self.post, author=self.user, text=TEST_ANOTHER_TEXT
+        )
+        self.assertContains(
+            self.guest_client.get(self.POST_DETAIL_URL), TEST_ANOTHER_TEXT
+        )
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.INDEX_URL)
+
+    def test_follow_purges_profile(self):
+        """Подписка сбрасывает профиль автора со счётчиком подписчиков."""
+        before = self.warm(self.USERNAME_URL)
+        Follow.objects.create(user=self.user, author=self.author)
+        after = self.guest_client.get(self.USERNAME_URL)
+        self.assertNotEqual(before.content, after.content)
+
+    def test_write_during_render_is_not_cached(self):
+        """Страница, во время рендера которой изменились данные, не
+        отдаётся из кэша после записи."""
+        self.guest_client.get(self.INDEX_URL)
+        bumped = []
+
+        def write_during_render(**kwargs):
+            if not bumped:
+                bumped.append(True)
+                caching.bump('posts')
+
+        template_rendered.connect(write_during_render)
+        try:
+            self.guest_client.get(self.INDEX_URL)
+        finally:
+            template_rendered.disconnect(write_during_render)
+        lookups = caching.misses['page']
+        self.guest_client.get(self.INDEX_URL)
+        self.assertEqual(caching.misses['page'], lookups + 1)
+
+    def test_page_keys_expire(self):
+        """Ключи страницы по любому адресу живут не дольше страницы."""
+        url = f'{self.INDEX_URL}?page=1'
+        self.warm(url)
+        names_key = middleware._names_key(
+            middleware._page_key(RequestFactory().get(url))
+        )
+        self.assertTrue(cache.get(names_key))
+        later = time.time() + settings.PAGE_CACHE_TIMEOUT + 1
+        with mock.patch.object(cache_backends, 'time', wraps=time) as clock:
+            clock.time.return_value = later
+            self.assertIsNone(cache.get(names_key))
+
+    def test_group_write_purges_group_page(self):
+        """Переименование группы сбрасывает её страницу."""
+        self.warm(self.GROUP_LIST_URL)
+        self.group.title = TEST_ANOTHER_GROUP
+        self.group.save()
+        self.assertContains(
+            self.guest_client.get(self.GROUP_LIST_URL), TEST_ANOTHER_GROUP
+        )
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            text=TEST_TEXT, author=cls.user, group=cls.group
+        )
+        cls.POST_DETAIL_URL = reverse(
+            DETAIL_ROUTE, kwargs={'post_id': cls.post.pk}
+        )
+        cls.URLS = (
+            reverse(INDEX_ROUTE),
+            reverse(GROUP_LIST_ROUTE, kwargs={'slug': TEST_SLUG}),
+            reverse(USERNAME_ROUTE, kwargs={'username': TEST_AUTHOR}),
+            cls.POST_DETAIL_URL,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_not_modified(self):
+        """Совпавший ETag или дата изменения дают 304."""
+        for url in self.URLS:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertTrue(response.has_header('ETag'))
+                validators = [('HTTP_IF_NONE_MATCH', response['ETag'])]
+                # Главная проверяется только по поколениям, без даты.
+                if url != self.URLS[0]:
+                    validators.append(
+                        ('HTTP_IF_MODIFIED_SINCE', response['Last-Modified'])
+                    )
+                for header, value in validators:
+                    self.assertEqual(
+                        self.authorized_client.get(
+                            url, **{header: value}
+                        ).status_code,
+                        304,
+                    )
+
+    def test_comment_changes_validator(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        response = self.authorized_client.get(self.POST_DETAIL_URL)
+        Comment.objects.create(
+            post=self.post, author=self.user, text=TEST_ANOTHER_TEXT
+        )
+        response = self.authorized_client.get(
+            self.POST_DETAIL_URL, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertContains(response, TEST_ANOTHER_TEXT)
+
+    def test_relogin_changes_validator(self):
+        """После нового входа страница с формой отдаётся заново:
+        в ней новый CSRF-токен."""
+        response = self.authorized_client.get(self.POST_DETAIL_URL)
+        self.authorized_client.logout()
+        self.authorized_client.force_login(self.user)
+        response = self.authorized_client.get(
+            self.POST_DETAIL_URL, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_index_validator_follows_generation(self):
+        """ETag главной меняет новый пост, а проверка не ходит в базу
+        за постами."""
+        url = self.URLS[0]
+        etag = self.authorized_client.get(url)['ETag']
+        with self.assertNumQueries(2):
+            # Только сессия и пользователь.
+            response = self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text=TEST_ANOTHER_TEXT, author=self.user)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, TEST_ANOTHER_TEXT)
+
+    def test_anonymous_hit_not_modified(self):
+        """Кэш страниц тоже отвечает 304 без запросов к БД."""
+        guest_client = Client()
+        guest_client.get(self.POST_DETAIL_URL)
+        response = guest_client.get(self.POST_DETAIL_URL)
+        with self.assertNumQueries(0):
+            response = guest_client.get(
+                self.POST_DETAIL_URL, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,123 @@
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, ImageVariant, Post, User
+from posts.utils import query_budget
+from .const_for_test import (
+    TEST_AUTHOR, ANOTHER_AUTHOR, TEST_GROUP, TEST_SLUG, TEST_DESCRIPTION,
+    TEST_TEXT, TEXT, INDEX_ROUTE, GROUP_LIST_ROUTE, USERNAME_ROUTE,
+    DETAIL_ROUTE, FOLLOW_ROUTE, EDIT_ROUTE, POST_CREATE_ROUTE, COMMENT_ROUTE,
+    PROFILE_FOLLOW_ROUTE, UNFOLLOW_ROUTE, SEARCH_ROUTE, TAG_ROUTE, TEST_TAG,
+    COMMENTS_ROUTE, POSTS_COUNT
+)
+from .utils import QueryBudgetMixin
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.author = User.objects.create_user(username=ANOTHER_AUTHOR)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION,
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            text=f'{TEST_TEXT} #{TEST_TAG}', author=cls.author, group=cls.group
+        )
+        cls.own_post = Post.objects.create(text=TEST_TEXT, author=cls.user)
+        Comment.objects.create(post=cls.post, author=cls.user, text=TEST_TEXT)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def add_posts(self):
+        for _ in range(POSTS_COUNT):
+            post = Post.objects.create(
+                text=f'{TEST_TEXT} #{TEST_TAG}',
+                author=self.author,
+                group=self.group,
+            )
+            Comment.objects.create(
+                post=post, author=self.user, text=TEST_TEXT
+            )
+            Comment.objects.create(
+                post=self.post, author=self.author, text=TEST_TEXT
+            )
+
+    def test_listing_queries_do_not_grow(self):
+        """Число запросов страниц не зависит от числа постов."""
+        urls = (
+            reverse(INDEX_ROUTE),
+            reverse(GROUP_LIST_ROUTE, kwargs={'slug': self.group.slug}),
+            reverse(USERNAME_ROUTE, kwargs={'username': self.author}),
+            reverse(DETAIL_ROUTE, kwargs={'post_id': self.post.pk}),
+            reverse(COMMENTS_ROUTE, kwargs={'post_id': self.post.pk}),
+            reverse(FOLLOW_ROUTE),
+            f'{reverse(SEARCH_ROUTE)}?q={TEST_TEXT}',
+            reverse(TAG_ROUTE, kwargs={'name': TEST_TAG}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertConstantQueries(self.client, url, self.add_posts)
+
+    def add_image_posts(self):
+        for _ in range(POSTS_COUNT):
+            post = Post.objects.create(text=TEST_TEXT, author=self.author)
+            source = f'posts/{post.pk}.jpg'
+            Post.objects.filter(pk=post.pk).update(
+                image=source, image_ready=True
+            )
+            ImageVariant.objects.create(
+                source=source, format='JPEG', width=480, height=170,
+                file=f'variants/{post.pk}.jpg',
+            )
+
+    def test_images_do_not_add_queries(self):
+        """Картинки страницы читаются одной пачкой."""
+        urls = (
+            reverse(INDEX_ROUTE),
+            reverse(USERNAME_ROUTE, kwargs={'username': self.author}),
+            reverse(FOLLOW_ROUTE),
+        )
+        self.add_image_posts()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertConstantQueries(
+                    self.client, url, self.add_image_posts
+                )
+
+    def test_write_views_fit_budget(self):
+        """Страницы записи укладываются в объявленный бюджет."""
+        requests = (
+            (reverse(POST_CREATE_ROUTE), None, 'get'),
+            (reverse(POST_CREATE_ROUTE), {TEXT: TEST_TEXT}, 'post'),
+            (reverse(EDIT_ROUTE, kwargs={'post_id': self.own_post.pk}),
+             None, 'get'),
+            (reverse(EDIT_ROUTE, kwargs={'post_id': self.own_post.pk}),
+             {TEXT: TEST_TEXT}, 'post'),
+            (reverse(COMMENT_ROUTE, kwargs={'post_id': self.post.pk}),
+             {TEXT: TEST_TEXT}, 'post'),
+            (reverse(UNFOLLOW_ROUTE, kwargs={'username': self.author}),
+             None, 'get'),
+            (reverse(PROFILE_FOLLOW_ROUTE, kwargs={'username': self.author}),
+             None, 'get'),
+        )
+        for url, data, method in requests:
+            with self.subTest(url=url, method=method):
+                self.assertQueryBudget(self.client, url, data, method)
+
+    @override_settings(DEBUG=True)
+    def test_budget_overrun_is_logged(self):
+        """В режиме DEBUG превышение бюджета пишется в лог."""
+        @query_budget(1)
+        def view(request):
+            return HttpResponse(User.objects.count() + Post.objects.count())
+
+        with self.assertLogs('posts.utils', 'WARNING') as logs:
+            view(RequestFactory().get('/'))
+        self.assertIn('2 SQL-запросов при бюджете 1', logs.output[0])
@@ -0,0 +1,129 @@
+import re
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import feed, tags
+from posts.utils import COMMENTS_COUNT
+from posts.models import Comment, Follow, Group, Post, User
+from .const_for_test import (
+    TEST_AUTHOR, ANOTHER_AUTHOR, TEST_GROUP, TEST_SLUG, TEST_DESCRIPTION,
+    TEST_TEXT, INDEX_ROUTE, GROUP_LIST_ROUTE, USERNAME_ROUTE, DETAIL_ROUTE,
+    FOLLOW_ROUTE, TAG_ROUTE, TEST_TAG, COMMENTS_ROUTE
+)
+
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?\w+$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.author = User.objects.create_user(username=ANOTHER_AUTHOR)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION,
+        )
+        Post.objects.bulk_create(
+            Post(
+                text=f'{TEST_TEXT} {i} #{TEST_TAG}',
+                author=cls.author,
+                group=cls.group,
+            )
+            for i in range(15)
+        )
+        for post in Post.objects.all():
+            tags.sync(post, created=True)
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.latest('pk')
+        Comment.objects.create(post=cls.post, author=cls.user, text=TEST_TEXT)
+        cls.urls = (
+            reverse(INDEX_ROUTE),
+            reverse(GROUP_LIST_ROUTE, kwargs={'slug': cls.group.slug}),
+            reverse(USERNAME_ROUTE, kwargs={'username': cls.author}),
+            reverse(DETAIL_ROUTE, kwargs={'post_id': cls.post.pk}),
+            reverse(COMMENTS_ROUTE, kwargs={'post_id': cls.post.pk}),
+            reverse(FOLLOW_ROUTE),
+            reverse(TAG_ROUTE, kwargs={'name': TEST_TAG}),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params or {})
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for step in self.explain(query['sql']):
+                with self.subTest(url=url, sql=query['sql'], step=step):
+                    self.assertIsNone(FULL_SCAN.search(step))
+                    self.assertIsNone(TEMP_SORT.search(step))
+
+    def test_views_use_indexes(self):
+        """Запросы страниц не сканируют таблицы и не сортируют
+        во временном B-дереве."""
+        for url in self.urls:
+            self.assert_plans(url)
+
+    @override_settings(POSTS_PAGINATION_MODE='cursor')
+    def test_cursor_views_use_indexes(self):
+        """Курсорная пагинация ищет страницу по индексу."""
+        for url in self.urls:
+            page_obj = self.client.get(url).context.get('page_obj')
+            if page_obj is None or not page_obj.has_next():
+                continue
+            self.assert_plans(url, {'cursor': page_obj.next_cursor})
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0)
+    def test_pulled_feed_uses_indexes(self):
+        """Подмешивание постов популярных авторов идёт по индексу."""
+        feed.rebuild()
+        self.assert_plans(reverse(FOLLOW_ROUTE))
+        self.assert_plans(reverse(FOLLOW_ROUTE), {'page': 2})
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0)
+    def test_several_pulled_authors_use_indexes(self):
+        """Посты нескольких популярных авторов сливаются по индексу,
+        без сортировки всех их постов."""
+        another = User.objects.create_user(username=TEST_GROUP)
+        Post.objects.bulk_create(
+            Post(text=f'{TEST_TEXT} {i}', author=another) for i in range(5)
+        )
+        Follow.objects.create(user=self.user, author=another)
+        feed.rebuild()
+        self.assertEqual(len(feed.pulled_authors(self.user)), 2)
+        self.assert_plans(reverse(FOLLOW_ROUTE))
+        self.assert_plans(reverse(FOLLOW_ROUTE), {'page': 2})
+        with override_settings(POSTS_PAGINATION_MODE='cursor'):
+            page_obj = self.client.get(
+                reverse(FOLLOW_ROUTE)
+            ).context['page_obj']
+            self.assert_plans(
+                reverse(FOLLOW_ROUTE), {'cursor': page_obj.next_cursor}
+            )
+
+    def test_comment_cursor_uses_index(self):
+        """Следующая страница комментариев ищется по индексу."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=TEST_TEXT)
+            for _ in range(COMMENTS_COUNT)
+        )
+        url = reverse(DETAIL_ROUTE, kwargs={'post_id': self.post.pk})
+        comments = self.client.get(url).context['comments']
+        self.assertTrue(comments.has_next())
+        self.assert_plans(
+            reverse(COMMENTS_ROUTE, kwargs={'post_id': self.post.pk}),
+            {'cursor': comments.next_cursor},
+        )
@@ -0,0 +1,114 @@
+from io import StringIO
+from urllib.parse import quote
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Group, Post, User
+from posts.utils import POSTS_COUNT
+from .const_for_test import (
+    TEST_AUTHOR, TEST_GROUP, TEST_SLUG, TEST_DESCRIPTION, SEARCH_ROUTE
+)
+
+SEARCH_URL = reverse(SEARCH_ROUTE)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.post = Post.objects.create(
+            text='Закат над рекой', author=cls.user
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def found(self, query, **params):
+        response = self.guest_client.get(SEARCH_URL, {'q': query, **params})
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_words_and_prefix(self):
+        """Находятся посты со всеми словами запроса, последнее — по
+        префиксу, без учёта регистра."""
+        self.assertEqual(self.found('ЗАКАТ'), [self.post.pk])
+        self.assertEqual(self.found('закат ре'), [self.post.pk])
+        self.assertEqual(self.found('закат лес'), [])
+        self.assertEqual(self.found('  '), [])
+        self.assertEqual(self.found('"*:('), [])
+
+    def test_ranked(self):
+        """Более релевантный пост выводится первым."""
+        best = Post.objects.create(
+            text='Река, река и снова река', author=self.user
+        )
+        self.assertEqual(self.found('рек'), [best.pk, self.post.pk])
+
+    def test_paginated(self):
+        """Выдача разбита на страницы, ссылки сохраняют запрос."""
+        Post.objects.bulk_create(
+            Post(text='Утренний закат', author=self.user)
+            for _ in range(POSTS_COUNT)
+        )
+        search.rebuild()
+        self.assertEqual(len(self.found('закат')), POSTS_COUNT)
+        self.assertEqual(len(self.found('закат', page=2)), 1)
+        response = self.guest_client.get(SEARCH_URL, {'q': 'закат'})
+        self.assertContains(
+            response, f'?q={quote("закат")}&amp;page=2'
+        )
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Рассвет в горах'
+        post.save()
+        self.assertEqual(self.found('закат'), [])
+        self.assertEqual(self.found('рассвет'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found('рассвет'), [])
+
+    def test_rebuild_command(self):
+        """Команда rebuild_search индексирует изменения в обход save."""
+        Post.objects.filter(pk=self.post.pk).update(text='Туман')
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(self.found('туман'), [self.post.pk])
+
+
+class AdminSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username=TEST_AUTHOR, email='admin@example.com', password='x'
+        )
+        cls.post = Post.objects.create(
+            text='Закат над рекой', author=cls.admin
+        )
+        cls.other = Post.objects.create(text='Рассвет', author=cls.admin)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP, slug=TEST_SLUG, description=TEST_DESCRIPTION
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_post_admin(self):
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'закат'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.post.pk],
+        )
+
+    def test_group_admin(self):
+        response = self.client.get(
+            reverse('admin:posts_group_changelist'),
+            {'q': TEST_DESCRIPTION.split()[0]},
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.group]
+        )
@@ -0,0 +1,91 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import tags
+from posts.models import Post, Tag, User
+from posts.utils import POSTS_COUNT
+from .const_for_test import (
+    TEST_AUTHOR, TEXT, POST_CREATE_ROUTE, EDIT_ROUTE, INDEX_ROUTE, TAG_ROUTE
+)
+
+
+def tag_url(name):
+    return reverse(TAG_ROUTE, kwargs={'name': name})
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def count(self, name):
+        return Tag.objects.get(name=name).posts_count
+
+    def test_extract(self):
+        """Теги без учёта регистра и повторов; якоря и сущности не теги."""
+        self.assertEqual(
+            tags.extract('#Закат и #закат, #море! a#b &#123; #'),
+            ['закат', 'море'],
+        )
+        self.assertEqual(tags.extract('#' + 'x' * 51), [])
+
+    def test_form_creates_tags(self):
+        """Теги из текста нового поста попадают в ленту тега."""
+        self.authorized_client.post(
+            reverse(POST_CREATE_ROUTE), {TEXT: 'Вечер #Закат #море'}
+        )
+        post = Post.objects.get()
+        self.assertEqual(self.count('закат'), 1)
+        response = self.authorized_client.get(tag_url('ЗАКАТ'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        response = self.authorized_client.get(reverse(INDEX_ROUTE))
+        self.assertContains(response, f'<a href="{tag_url("море")}">#море</a>')
+
+    def test_unknown_tag(self):
+        response = self.authorized_client.get(tag_url('нет'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_counts_follow_edits(self):
+        """Счётчики меняются при правке текста и удалении поста."""
+        self.authorized_client.post(
+            reverse(POST_CREATE_ROUTE), {TEXT: '#закат'}
+        )
+        post = Post.objects.get()
+        Post.objects.create(text='#закат #море', author=self.user)
+        self.assertEqual(self.count('закат'), 2)
+        self.authorized_client.post(
+            reverse(EDIT_ROUTE, kwargs={'post_id': post.pk}),
+            {TEXT: '#море'},
+        )
+        self.assertEqual(self.count('закат'), 1)
+        self.assertEqual(self.count('море'), 2)
+        Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(self.count('море'), 1)
+
+    @override_settings(POSTS_PAGINATION_MODE='cursor')
+    def test_cursor_pagination(self):
+        """Лента тега поддерживает курсорную пагинацию."""
+        for i in range(POSTS_COUNT + 1):
+            Post.objects.create(text=f'{i} #закат', author=self.user)
+        page = self.authorized_client.get(tag_url('закат')).context['page_obj']
+        self.assertEqual(len(page), POSTS_COUNT)
+        response = self.authorized_client.get(
+            tag_url('закат'), {'cursor': page.next_cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+    def test_reconcile(self):
+        """reconcile_counters исправляет счётчики тегов."""
+        Post.objects.create(text='#закат', author=self.user)
+        Tag.objects.update(posts_count=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.count('закат'), 1)
@@ -0,0 +1,141 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import caching, trending
+from posts.models import Group, GroupActivity, Post, PostActivity, User
+from .const_for_test import (
+    TEST_AUTHOR, TEST_GROUP, TEST_SLUG, TEST_DESCRIPTION, TEST_TEXT, TEXT,
+    INDEX_ROUTE, COMMENT_ROUTE, POST_CREATE_ROUTE
+)
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION,
+        )
+        cls.quiet = Post.objects.create(text='Тихий пост', author=cls.user)
+        cls.busy = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def comment(self, post):
+        self.authorized_client.post(
+            reverse(COMMENT_ROUTE, kwargs={'post_id': post.pk}),
+            {TEXT: TEST_TEXT},
+        )
+
+    def test_events_fill_current_bucket(self):
+        """Комментарии и посты группы копятся в строке текущего интервала."""
+        self.comment(self.busy)
+        self.comment(self.busy)
+        self.authorized_client.post(
+            reverse(POST_CREATE_ROUTE),
+            {TEXT: TEST_TEXT, 'group': self.group.pk},
+        )
+        activity = PostActivity.objects.get(post=self.busy)
+        self.assertEqual(activity.count, 2)
+        self.assertEqual(
+            activity.bucket, trending.bucket_start(timezone.now())
+        )
+        # Группа: два поста в ней и два комментария к её посту.
+        self.assertEqual(GroupActivity.objects.get(group=self.group).count, 4)
+
+    def test_old_buckets_weigh_less(self):
+        """Вес интервала вдвое падает за TRENDING_HALF_LIFE."""
+        now = timezone.now()
+        PostActivity.objects.bulk_create([
+            PostActivity(post=self.busy, bucket=now, count=3),
+            PostActivity(
+                post=self.quiet,
+                bucket=now - timedelta(seconds=settings.TRENDING_HALF_LIFE),
+                count=4,
+            ),
+        ])
+        top = trending.compute(now)
+        self.assertEqual(
+            [(post['pk'], post['score']) for post in top['posts']],
+            [(self.busy.pk, 3.0), (self.quiet.pk, 2.0)],
+        )
+        self.assertEqual(top['posts'][0]['author'], self.user.username)
+
+    def test_index_shows_cached_top(self):
+        """Главная выводит популярное из кэша до истечения срока."""
+        self.comment(self.busy)
+        response = self.authorized_client.get(reverse(INDEX_ROUTE))
+        self.assertEqual(
+            [post['pk'] for post in response.context['trending']['posts']],
+            [self.busy.pk],
+        )
+        self.assertContains(response, self.group.title)
+        self.comment(self.quiet)
+        self.comment(self.quiet)
+        top = self.authorized_client.get(reverse(INDEX_ROUTE)).context[
+            'trending'
+        ]
+        self.assertEqual(len(top['posts']), 1)
+
+    def test_index_etag_follows_recomputed_top(self):
+        """Пересчёт по сроку с новыми местами меняет ETag главной."""
+        self.comment(self.busy)
+        url = reverse(INDEX_ROUTE)
+        etag = self.authorized_client.get(url)['ETag']
+        self.comment(self.quiet)
+        self.comment(self.quiet)
+        self.assertEqual(
+            self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            304,
+        )
+        later = time.time() + settings.TRENDING_REFRESH + 1
+        with mock.patch.object(caching, 'time', wraps=time) as clock:
+            clock.time.return_value = later
+            self.authorized_client.get(url)
+            response = self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post['pk'] for post in response.context['trending']['posts']],
+            [self.quiet.pk, self.busy.pk],
+        )
+
+    def test_roll_trending(self):
+        """Команда удаляет интервалы вне окна и обновляет популярное."""
+        self.authorized_client.get(reverse(INDEX_ROUTE))
+        stale = timezone.now() - timedelta(
+            seconds=settings.TRENDING_WINDOW + settings.TRENDING_BUCKET
+        )
+        PostActivity.objects.create(post=self.quiet, bucket=stale, count=9)
+        self.comment(self.busy)
+        out = StringIO()
+        call_command('roll_trending', stdout=out)
+        self.assertIn('Удалено интервалов: 1', out.getvalue())
+        self.assertEqual(PostActivity.objects.get().post_id, self.busy.pk)
+        with mock.patch.object(trending, 'compute') as compute:
+            top = self.authorized_client.get(reverse(INDEX_ROUTE)).context[
+                'trending'
+            ]
+        compute.assert_not_called()
+        self.assertEqual(
+            [post['pk'] for post in top['posts']], [self.busy.pk]
+        )
@@ -0,0 +1,110 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import images
+from posts.models import Post, User
+from .const_for_test import (
+    TEST_AUTHOR, TEST_TEXT, TEXT, IMAGE, POST_CREATE_ROUTE, EDIT_ROUTE,
+    DETAIL_ROUTE
+)
+
+POST_CREATE_URL = reverse(POST_CREATE_ROUTE)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png(size, name='picture.png'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, image):
+        return self.authorized_client.post(
+            POST_CREATE_URL, {TEXT: TEST_TEXT, IMAGE: image}
+        )
+
+    def test_size_recorded(self):
+        """Размер картинки сохраняется в посте."""
+        self.create(png((40, 30)))
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (40, 30))
+
+    @override_settings(IMAGE_MAX_DIMENSION=100)
+    def test_downscaled(self):
+        """Большая картинка уменьшается до IMAGE_MAX_DIMENSION."""
+        self.create(png((300, 150)))
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels(self):
+        """Картинка с лишними пикселями отклоняется по заголовку."""
+        response = self.create(png((20, 20)))
+        self.assertFormError(
+            response, 'form', IMAGE, 'Слишком большое разрешение картинки.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=1024 * 1024)
+    def test_oversized_upload(self):
+        """Файл больше IMAGE_MAX_UPLOAD_SIZE отклоняется."""
+        image = SimpleUploadedFile(
+            'big.png', b'\0' * (1024 * 1024 + 1), 'image/png'
+        )
+        response = self.create(image)
+        self.assertFormError(response, 'form', IMAGE, 'Файл больше 1 МБ.')
+        self.assertFalse(Post.objects.exists())
+
+    def test_size_cleared_with_image(self):
+        """Без картинки размер сбрасывается."""
+        self.create(png((40, 30)))
+        post = Post.objects.get()
+        self.authorized_client.post(
+            reverse(EDIT_ROUTE, kwargs={'post_id': post.pk}),
+            {TEXT: TEST_TEXT, f'{IMAGE}-clear': 'on'},
+        )
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_placeholder_rendered_inline(self):
+        """Заглушка выводится в разметке до и после подготовки вариантов,
+        картинка загружается лениво."""
+        self.create(png((40, 30)))
+        post = Post.objects.get()
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        url = reverse(DETAIL_ROUTE, kwargs={'post_id': post.pk})
+        response = self.authorized_client.get(url)
+        self.assertContains(response, post.image_placeholder)
+        self.assertNotContains(response, 'loading="lazy"')
+        images.work()
+        response = self.authorized_client.get(url)
+        self.assertContains(response, post.image_placeholder)
+        self.assertContains(response, 'loading="lazy"')
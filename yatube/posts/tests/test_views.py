@@ -1,19 +1,26 @@
 import shutil
 import tempfile
+from io import StringIO
+
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
-from posts.models import Group, Post, User, Follow
+from posts import caching, feed
+from posts.models import FeedItem, Group, Post, User, Follow
 from .const_for_test import (
     TEST_AUTHOR, TEST_GROUP, TEST_SLUG, TEST_DESCRIPTION, TEST_TEXT,
     POSTS_COUNT, INDEX_ROUTE, USERNAME_ROUTE, EDIT_ROUTE, DETAIL_ROUTE,
     GROUP_LIST_ROUTE, POST_CREATE_ROUTE, TEST_GIF, PROFILE_FOLLOW_ROUTE,
-    ANOTHER_AUTHOR, FOLLOW_ROUTE, UNFOLLOW_ROUTE
+    ANOTHER_AUTHOR, FOLLOW_ROUTE, UNFOLLOW_ROUTE, TEST_ANOTHER_TEXT,
+    TEST_ANOTHER_GROUP, TEST_ANOTHER_SLUG
 )
 
 
@@ -153,13 +160,84 @@ class PostsViewsTest(TestCase):
             text=TEST_TEXT
         )
         response_1 = self.guest_client.get(INDEX_URL)
-        test_post.delete()
+        # Изменение в обход сигналов не сбрасывает кэш.
+        Post.objects.filter(pk=test_post.pk).update(text=TEST_ANOTHER_TEXT)
         response_2 = self.guest_client.get(INDEX_URL)
         self.assertEqual(response_1.content, response_2.content)
         cache.clear()
         response_3 = self.guest_client.get(INDEX_URL)
         self.assertNotEqual(response_1.content, response_3.content)
 
+    def test_cache_invalidated_on_delete(self):
+        """Удаление поста сразу сбрасывает кэш главной страницы."""
+        test_post = Post.objects.create(
+            group=self.group,
+            author=self.user,
+            text=TEST_ANOTHER_TEXT
+        )
+        response_1 = self.guest_client.get(INDEX_URL)
+        self.assertContains(response_1, TEST_ANOTHER_TEXT)
+        test_post.delete()
+        response_2 = self.guest_client.get(INDEX_URL)
+        self.assertNotContains(response_2, TEST_ANOTHER_TEXT)
+
+    def test_cache_invalidated_on_group_change(self):
+        """Перенос поста сбрасывает кэш страниц старой и новой группы."""
+        other_group = Group.objects.create(
+            title=TEST_ANOTHER_GROUP,
+            slug=TEST_ANOTHER_SLUG,
+        )
+        self.guest_client.get(self.GROUP_LIST_URL)
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = other_group
+        post.save()
+        response = self.guest_client.get(self.GROUP_LIST_URL)
+        self.assertNotContains(response, self.POST_DETAIL_URL)
+        response = self.guest_client.get(
+            reverse(GROUP_LIST_ROUTE, kwargs={'slug': other_group.slug})
+        )
+        self.assertContains(response, self.POST_DETAIL_URL)
+
+    def test_article_cache_invalidated_on_edit(self):
+        """Фрагмент статьи кэшируется до правки поста через post_edit."""
+        self.authorized_client.get(INDEX_URL)
+        Post.objects.filter(pk=self.post.pk).update(text=TEST_ANOTHER_TEXT)
+        caching.bump('posts')
+        response = self.authorized_client.get(INDEX_URL)
+        self.assertNotContains(response, TEST_ANOTHER_TEXT)
+        self.authorized_client.post(
+            self.POST_EDIT_URL,
+            data={'text': TEST_ANOTHER_TEXT, 'group': self.group.pk},
+        )
+        response = self.authorized_client.get(INDEX_URL)
+        self.assertContains(response, TEST_ANOTHER_TEXT)
+
+    def test_article_cache_follows_author_name(self):
+        """Фрагмент статьи выводит новое имя автора."""
+        self.authorized_client.get(INDEX_URL)
+        author = User.objects.get(pk=self.post.author_id)
+        author.first_name = TEST_ANOTHER_TEXT
+        author.save()
+        caching.bump('posts')
+        response = self.authorized_client.get(INDEX_URL)
+        self.assertContains(response, TEST_ANOTHER_TEXT)
+
+    def test_cache_hit_ratio(self):
+        """Обращения к кэшу фрагментов учитываются и сообщаются сигналом."""
+        lookups = []
+
+        def receiver(sender, name, hit, **kwargs):
+            lookups.append((name, hit))
+
+        caching.fragment_cache_lookup.connect(receiver)
+        self.addCleanup(caching.fragment_cache_lookup.disconnect, receiver)
+        self.authorized_client.get(INDEX_URL)
+        self.authorized_client.get(INDEX_URL)
+        self.assertEqual(
+            lookups, [('index_page', False), ('index_page', True)]
+        )
+        self.assertGreater(caching.hit_ratio('index_page'), 0)
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -220,6 +298,77 @@ class PaginatorViewsTest(TestCase):
                     )
 
 
+@override_settings(POSTS_PAGINATION_MODE='cursor')
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=TEST_AUTHOR)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION
+        )
+        Post.objects.bulk_create(
+            Post(text=f'{TEST_TEXT} {i}', author=cls.user, group=cls.group)
+            for i in range(13)
+        )
+        cls.GROUP_LIST_URL = reverse(
+            GROUP_LIST_ROUTE,
+            kwargs={'slug': cls.group.slug}
+        )
+        cls.USERNAME_URL = reverse(
+            USERNAME_ROUTE,
+            kwargs={'username': cls.user.username}
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages(self):
+        """Курсорная пагинация отдаёт все посты без повторов."""
+        for address in (INDEX_URL, self.GROUP_LIST_URL, self.USERNAME_URL):
+            with self.subTest(address=address):
+                first = self.client.get(address).context['page_obj']
+                self.assertEqual(len(first), POSTS_COUNT)
+                self.assertFalse(first.has_previous())
+                self.assertTrue(first.has_next())
+                second = self.client.get(
+                    address, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    len(second), Post.objects.count() - POSTS_COUNT
+                )
+                self.assertFalse(second.has_next())
+                self.assertTrue(second.has_previous())
+                self.assertFalse(set(first) & set(second))
+                back = self.client.get(
+                    address, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_cursor_page_is_stable(self):
+        """Новые посты не сдвигают границы следующей страницы."""
+        first = self.client.get(INDEX_URL).context['page_obj']
+        expected = list(
+            self.client.get(
+                INDEX_URL, {'cursor': first.next_cursor}
+            ).context['page_obj']
+        )
+        Post.objects.create(text=TEST_TEXT, author=self.user)
+        cache.clear()
+        second = self.client.get(
+            INDEX_URL, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(second), expected)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.client.get(INDEX_URL, {'cursor': 'broken'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), POSTS_COUNT)
+        self.assertFalse(page_obj.has_previous())
+
+
 class FollowTests(TestCase):
 
     @classmethod
@@ -303,3 +452,178 @@ class FollowTests(TestCase):
         test_count_2 = Follow.objects.filter(
             user=author_user, author=author_user).count()
         self.assertEqual(test_count_1, test_count_2)
+
+    def test_feed_is_materialized(self):
+        """Подписка заполняет ленту, отписка её чистит."""
+        author_user = User.objects.create_user(username=ANOTHER_AUTHOR)
+        old_post = Post.objects.create(author=author_user, text=TEST_TEXT)
+        self.authorized_client.get(
+            reverse(PROFILE_FOLLOW_ROUTE, args=(author_user.username,))
+        )
+        new_post = Post.objects.create(author=author_user, text=TEST_TEXT)
+        self.assertEqual(
+            set(FeedItem.objects.filter(
+                user=self.user
+            ).values_list('post', flat=True)),
+            {old_post.pk, new_post.pk}
+        )
+        self.authorized_client.get(
+            reverse(UNFOLLOW_ROUTE, args=(author_user.username,))
+        )
+        self.assertFalse(FeedItem.objects.filter(user=self.user).exists())
+
+    @override_settings(FEED_BACKFILL_DEPTH=2)
+    def test_backfill_is_capped(self):
+        """Подписка кладёт в ленту только последние посты автора."""
+        author_user = User.objects.create_user(username=ANOTHER_AUTHOR)
+        posts = [
+            Post.objects.create(author=author_user, text=TEST_TEXT)
+            for _ in range(3)
+        ]
+        Follow.objects.create(user=self.user, author=author_user)
+        self.assertEqual(
+            set(FeedItem.objects.filter(
+                user=self.user
+            ).values_list('post', flat=True)),
+            {posts[1].pk, posts[2].pk},
+        )
+
+    def test_rebuild_feed_command(self):
+        """Команда rebuild_feed восстанавливает ленту."""
+        author_user = User.objects.create_user(username=ANOTHER_AUTHOR)
+        test_post = Post.objects.create(author=author_user, text=TEST_TEXT)
+        Follow.objects.create(user=self.user, author=author_user)
+        FeedItem.objects.all().delete()
+        call_command('rebuild_feed', stdout=StringIO())
+        response = self.authorized_client.get(FOLLOW_URL)
+        self.assertIn(test_post, response.context['page_obj'])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_hybrid_feed_pulls_popular_authors(self):
+        """Посты популярных авторов не раскладываются по лентам,
+        а подмешиваются при чтении."""
+        star = User.objects.create_user(username=ANOTHER_AUTHOR)
+        regular = User.objects.create_user(username=TEST_GROUP)
+        Follow.objects.create(user=self.user, author=star)
+        Follow.objects.create(user=regular, author=star)
+        call_command('sync_feed_delivery', stdout=StringIO())
+        star_post = Post.objects.create(author=star, text=TEST_TEXT)
+        Follow.objects.create(user=self.user, author=regular)
+        regular_post = Post.objects.create(author=regular, text=TEST_TEXT)
+        self.assertFalse(FeedItem.objects.filter(post=star_post).exists())
+        self.assertTrue(
+            FeedItem.objects.filter(post=regular_post).exists()
+        )
+        response = self.authorized_client.get(FOLLOW_URL)
+        self.assertEqual(
+            list(response.context['page_obj']), [regular_post, star_post]
+        )
+
+    @override_settings(FEED_FANOUT_THRESHOLD=3)
+    def test_author_crossing_threshold_keeps_feed(self):
+        """Переход автора между push и pull не теряет и не удваивает
+        посты в лентах подписчиков и идёт только с запасом от порога."""
+        star = User.objects.create_user(username=ANOTHER_AUTHOR)
+        others = [
+            User.objects.create_user(username=f'{TEST_GROUP}{i}')
+            for i in range(3)
+        ]
+        Follow.objects.create(user=self.user, author=star)
+        pushed = Post.objects.create(author=star, text=TEST_TEXT)
+        for other in others:
+            Follow.objects.create(user=other, author=star)
+        # Подписка сама автора не переводит.
+        self.assertFalse(feed.is_pulled(star.pk))
+        call_command('sync_feed_delivery', stdout=StringIO())
+        self.assertTrue(feed.is_pulled(star.pk))
+        self.assertFalse(FeedItem.objects.filter(author=star).exists())
+        pulled = Post.objects.create(author=star, text=TEST_ANOTHER_TEXT)
+        self.assertEqual(
+            list(feed.timeline(self.user)), [pulled, pushed]
+        )
+        self.assertEqual(feed.timeline(self.user).count(), 2)
+        # Ниже порога, но выше FEED_PUSH_RATIO от него автор остаётся
+        # на pull.
+        Follow.objects.filter(user__in=others[:2]).delete()
+        self.assertEqual(feed.sync_delivery(), 0)
+        self.assertTrue(feed.is_pulled(star.pk))
+        Follow.objects.filter(user=others[2]).delete()
+        self.assertEqual(feed.sync_delivery(), 1)
+        self.assertEqual(
+            set(FeedItem.objects.filter(
+                user=self.user
+            ).values_list('post', flat=True)),
+            {pushed.pk, pulled.pk},
+        )
+        response = self.authorized_client.get(FOLLOW_URL)
+        self.assertEqual(
+            list(response.context['page_obj']), [pulled, pushed]
+        )
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0)
+    def test_backfill_skips_pulled_authors(self):
+        """Подписка на автора на pull не раскладывает его посты."""
+        star = User.objects.create_user(username=ANOTHER_AUTHOR)
+        Follow.objects.create(user=star, author=star)
+        feed.sync_delivery()
+        post = Post.objects.create(author=star, text=TEST_TEXT)
+        Follow.objects.create(user=self.user, author=star)
+        self.assertFalse(FeedItem.objects.filter(author=star).exists())
+        response = self.authorized_client.get(FOLLOW_URL)
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_feed_pages_are_sliced_in_sql(self):
+        """Страница ленты читается с OFFSET, а не с начала ленты."""
+        author_user = User.objects.create_user(username=ANOTHER_AUTHOR)
+        Follow.objects.create(user=self.user, author=author_user)
+        Post.objects.bulk_create(
+            Post(text=f'{TEST_TEXT} {i}', author=author_user)
+            for i in range(POSTS_COUNT + 3)
+        )
+        call_command('rebuild_feed', stdout=StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            page = self.authorized_client.get(
+                FOLLOW_URL, {'page': 2}
+            ).context['page_obj']
+        self.assertEqual(len(page), 3)
+        self.assertTrue(any(
+            f'LIMIT 3 OFFSET {POSTS_COUNT}' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_bench_feed_uses_hybrid_path(self):
+        """bench_feed учитывает подписчиков из bulk_create: популярный
+        автор уходит в pull только выше порога."""
+        out = StringIO()
+        call_command(
+            'bench_feed', '--followers', '5', '--authors', '3',
+            '--posts', '2', '--reads', '1', '--thresholds', '0', '2', '100',
+            stdout=out,
+        )
+        rows = {
+            int(line.split()[0]): float(line.split()[1])
+            for line in out.getvalue().splitlines()[1:]
+        }
+        # Пост звезды — 5 записей, поста обычного автора — 1.
+        self.assertEqual(rows, {0: 0.0, 2: round(2 / 3, 1), 100: 2.3})
+        self.assertFalse(User.objects.filter(
+            username__startswith='bench-feed'
+        ).exists())
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0,
+                       POSTS_PAGINATION_MODE='cursor')
+    def test_hybrid_feed_cursor_pages(self):
+        """Курсорная пагинация работает на смешанной ленте."""
+        star = User.objects.create_user(username=ANOTHER_AUTHOR)
+        Follow.objects.create(user=self.user, author=star)
+        feed.sync_delivery()
+        Post.objects.bulk_create(
+            Post(text=f'{TEST_TEXT} {i}', author=star) for i in range(13)
+        )
+        first = self.authorized_client.get(FOLLOW_URL).context['page_obj']
+        second = self.authorized_client.get(
+            FOLLOW_URL, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(first), POSTS_COUNT)
+        self.assertEqual(len(first) + len(second), 13)
+        self.assertFalse(set(first) & set(second))
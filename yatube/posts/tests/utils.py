@@ -0,0 +1,43 @@
+from urllib.parse import urlsplit
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from posts.utils import count_queries
+from .const_for_test import TEST_GIF
+
+
+def upload(name='small.gif', content=TEST_GIF):
+    """Загружаемая картинка для форм и полей ImageField."""
+    return SimpleUploadedFile(
+        name=name, content=content, content_type='image/gif'
+    )
+
+
+class QueryBudgetMixin:
+    """Проверки бюджета SQL-запросов, объявленного через query_budget."""
+
+    def count_queries(self, client, url, data=None, method='get'):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            getattr(client, method)(url, data or {})
+        return count_queries(
+            query['sql'] for query in queries.captured_queries
+        )
+
+    def assertQueryBudget(self, client, url, data=None, method='get'):
+        budget = resolve(urlsplit(url).path).func.query_budget
+        count = self.count_queries(client, url, data, method)
+        self.assertLessEqual(
+            count, budget, f'{url}: {count} запросов при бюджете {budget}'
+        )
+        return count
+
+    def assertConstantQueries(self, client, url, grow):
+        """Число запросов не меняется, когда на странице больше записей."""
+        before = self.assertQueryBudget(client, url)
+        grow()
+        self.assertEqual(before, self.count_queries(client, url), url)
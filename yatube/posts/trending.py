@@ -0,0 +1,155 @@
+"""Популярные посты и группы по недавней активности.
+
+Новые посты группы и комментарии увеличивают счётчики PostActivity и
+GroupActivity за текущий интервал длиной TRENDING_BUCKET секунд.
+Оценка — сумма счётчиков окна TRENDING_WINDOW, где каждый интервал
+весит вдвое меньше с каждыми TRENDING_HALF_LIFE секундами возраста.
+Первые TRENDING_TOP постов и групп со всем, что нужно для вывода,
+хранятся в кэше: их пересчитывает команда roll_trending, которая
+заодно удаляет интервалы старше окна, а при отсутствии в кэше или
+по истечении TRENDING_REFRESH — один из запросов через get_or_set.
+Поколение SCOPE, от которого зависят ETag и кэш главной, меняется,
+только когда пересчёт изменил то, что выводится.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.template.defaultfilters import truncatechars
+from django.utils import timezone
+
+from . import caching, groups
+from .models import GroupActivity, Post, PostActivity
+
+SCOPE = 'trending'
+REFRESH_SCOPE = 'trending:refresh'
+TOP_KEY = 'trending:top'
+SHOWN_KEY = 'trending:shown'
+TEXT_LENGTH = 60
+
+
+def bucket_start(moment):
+    size = settings.TRENDING_BUCKET
+    return moment - timedelta(seconds=moment.timestamp() % size)
+
+
+def _bump(model, column, object_id):
+    # Один запрос и без гонок: строку интервала создаёт первое событие.
+    bucket = connection.ops.adapt_datetimefield_value(
+        bucket_start(timezone.now())
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {model._meta.db_table} ({column}, bucket, count) '
+            f'VALUES (%s, %s, 1) ON CONFLICT ({column}, bucket) '
+            f'DO UPDATE SET count = count + 1',
+            [object_id, bucket],
+        )
+
+
+def post_created(post):
+    if post.group_id is not None:
+        _bump(GroupActivity, 'group_id', post.group_id)
+
+
+def comment_created(comment):
+    _bump(PostActivity, 'post_id', comment.post_id)
+    group_id = comment.post.group_id
+    if group_id is not None:
+        _bump(GroupActivity, 'group_id', group_id)
+
+
+def _top(model, field, now):
+    window_start = now - timedelta(seconds=settings.TRENDING_WINDOW)
+    half_life = settings.TRENDING_HALF_LIFE
+    scores = defaultdict(float)
+    for object_id, bucket, count in model.objects.filter(
+        bucket__gte=window_start
+    ).values_list(field, 'bucket', 'count').iterator():
+        age = (now - bucket).total_seconds()
+        scores[object_id] += count * 0.5 ** (age / half_life)
+    return heapq.nlargest(
+        settings.TRENDING_TOP, scores.items(), key=lambda item: item[1]
+    )
+
+
+def compute(now=None):
+    """Первые TRENDING_TOP постов и групп по убыванию оценки."""
+    now = now or timezone.now()
+    top_posts = _top(PostActivity, 'post_id', now)
+    posts = Post.objects.select_related('author').in_bulk(
+        [post_id for post_id, _ in top_posts]
+    )
+    top_groups = [
+        (groups.get_by_id(group_id), score)
+        for group_id, score in _top(GroupActivity, 'group_id', now)
+    ]
+    return {
+        'posts': [
+            {
+                'pk': post_id,
+                'text': truncatechars(posts[post_id].text, TEXT_LENGTH),
+                'author': posts[post_id].author.username,
+                'score': score,
+            }
+            for post_id, score in top_posts if post_id in posts
+        ],
+        'groups': [
+            {'slug': group.slug, 'title': group.title, 'score': score}
+            for group, score in top_groups if group is not None
+        ],
+    }
+
+
+def _shown(snapshot):
+    # Оценки не выводятся и меняются при каждом пересчёте.
+    return (
+        [(post['pk'], post['text'], post['author'])
+         for post in snapshot['posts']],
+        [(group['slug'], group['title']) for group in snapshot['groups']],
+    )
+
+
+def top():
+    changed = []
+
+    def recompute():
+        snapshot = compute()
+        shown = _shown(snapshot)
+        if cache.get(SHOWN_KEY) != shown:
+            changed.append(shown)
+        return snapshot
+
+    snapshot = caching.get_or_set(
+        TOP_KEY,
+        recompute,
+        timeout=settings.TRENDING_REFRESH,
+        version=caching.generation(REFRESH_SCOPE),
+    )
+    if changed:
+        # Поколение меняется после записи в кэш: иначе параллельный
+        # запрос получил бы новый ETag вместе со старыми местами.
+        cache.set(SHOWN_KEY, changed[0], settings.TRENDING_WINDOW)
+        caching.bump(SCOPE)
+    return snapshot
+
+
+def refresh():
+    """Пересчитывает первые места и кладёт их в кэш."""
+    caching.bump(REFRESH_SCOPE)
+    return top()
+
+
+def roll_off(now=None):
+    """Удаляет интервалы старше окна; возвращает число удалённых."""
+    now = now or timezone.now()
+    window_start = bucket_start(
+        now - timedelta(seconds=settings.TRENDING_WINDOW)
+    )
+    removed = 0
+    for model in (PostActivity, GroupActivity):
+        removed += model.objects.filter(bucket__lt=window_start).delete()[0]
+    return removed
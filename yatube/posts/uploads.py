@@ -0,0 +1,80 @@
+"""Приём загружаемых картинок.
+
+CappedUploadHandler пишет тело загрузки во временный файл, а не в
+память, и перестаёт сохранять данные после IMAGE_MAX_UPLOAD_SIZE байт.
+Форма отклоняет такие файлы, как и картинки, у которых по заголовку
+больше IMAGE_MAX_PIXELS пикселей («бомбы» распаковки): пиксели при этом
+не декодируются. Остальные картинки ingest уменьшает до
+IMAGE_MAX_DIMENSION по большей стороне и описывает: размер и
+заглушка сохраняются в посте.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+from . import images
+
+# Качество пересжатия уменьшенных JPEG.
+QUALITY = 90
+
+
+class CappedUploadHandler(TemporaryFileUploadHandler):
+    """Сохраняет загрузку на диск, но не больше IMAGE_MAX_UPLOAD_SIZE."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_MAX_UPLOAD_SIZE:
+            # Остаток тела всё равно читается парсером, но не пишется.
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.oversized = self.received > settings.IMAGE_MAX_UPLOAD_SIZE
+        return file
+
+
+def is_oversized(upload):
+    return getattr(upload, 'oversized', False) or (
+        upload.size is not None
+        and upload.size > settings.IMAGE_MAX_UPLOAD_SIZE
+    )
+
+
+def is_bomb(size):
+    width, height = size
+    return width * height > settings.IMAGE_MAX_PIXELS
+
+
+def ingest(upload):
+    """Уменьшает картинку до IMAGE_MAX_DIMENSION.
+
+    Возвращает файл (прежний, если уменьшать не нужно) и поля поста,
+    описывающие картинку.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    limit = settings.IMAGE_MAX_DIMENSION
+    if max(image.size) <= limit:
+        image.load()
+        upload.seek(0)
+        return upload, images.describe(ImageOps.exif_transpose(image))
+    image_format = image.format
+    # JPEG декодируется сразу в уменьшенном масштабе.
+    image.draft('RGB', (limit, limit))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    buffer = BytesIO()
+    options = {'quality': QUALITY} if image_format == 'JPEG' else {}
+    image.save(buffer, image_format, **options)
+    resized = SimpleUploadedFile(
+        upload.name, buffer.getvalue(), upload.content_type
+    )
+    return resized, images.describe(image)
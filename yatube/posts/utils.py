@@ -1,10 +1,246 @@
-from django.core.paginator import Paginator
+import hashlib
+import logging
+from functools import wraps
 
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models import Q
+from django.middleware.csrf import get_token
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import (
+    urlsafe_base64_decode, urlsafe_base64_encode
+)
+from django.views.decorators.http import condition
+
+
+logger = logging.getLogger(__name__)
 
 POSTS_COUNT = 10
+COMMENTS_COUNT = 20
+CURSOR_PARAM = 'cursor'
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+TRANSACTION_STATEMENTS = (
+    'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'
+)
+
+
+def encode_cursor(direction, value, pk):
+    raw = f'{direction}|{value.isoformat()}|{pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор на направление, значение поля и pk.
+
+    Для испорченного курсора поднимает ValueError.
+    """
+    direction, value, pk = force_str(
+        urlsafe_base64_decode(cursor)
+    ).split('|')
+    value = parse_datetime(value)
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or value is None:
+        raise ValueError(cursor)
+    return direction, value, int(pk)
+
+
+class CursorPage(Page):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor=None,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Page cursor {self.cursor or "first"}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по паре (field, pk) без COUNT и OFFSET.
+
+    Записи идут в порядке (-field, pk), поэтому границы страниц
+    не сдвигаются, когда сверху появляются новые записи.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.field = field
+
+    def get_page(self, cursor):
+        if not cursor:
+            return self._first_page()
+        try:
+            direction, value, pk = decode_cursor(cursor)
+        except ValueError:
+            return self._first_page()
+        if direction == CURSOR_NEXT:
+            return self._page_after(cursor, value, pk)
+        return self._page_before(cursor, value, pk)
+
+    def page(self, cursor):
+        return self.get_page(cursor)
+
+    def _ordered(self, descending=True):
+        if descending:
+            return self.object_list.order_by(f'-{self.field}', 'pk')
+        return self.object_list.order_by(self.field, '-pk')
+
+    def _first_page(self):
+        rows = list(self._ordered()[:self.per_page + 1])
+        return self._build(None, rows[:self.per_page],
+                           has_next=len(rows) > self.per_page,
+                           has_previous=False)
+
+    def _page_after(self, cursor, value, pk):
+        # Диапазон по field даёт индексу точку старта, а отсечение
+        # уже показанных строк с тем же значением идёт фильтром.
+        seek = (
+            Q(**{f'{self.field}__lte': value})
+            & ~Q(**{self.field: value, 'pk__lte': pk})
+        )
+        rows = list(self._ordered().filter(seek)[:self.per_page + 1])
+        return self._build(cursor, rows[:self.per_page],
+                           has_next=len(rows) > self.per_page,
+                           has_previous=True)
+
+    def _page_before(self, cursor, value, pk):
+        seek = (
+            Q(**{f'{self.field}__gte': value})
+            & ~Q(**{self.field: value, 'pk__gte': pk})
+        )
+        rows = list(
+            self._ordered(descending=False).filter(seek)[:self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self._build(cursor, rows,
+                           has_next=True,
+                           has_previous=has_previous)
+
+    def _build(self, cursor, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            last = rows[-1]
+            next_cursor = encode_cursor(
+                CURSOR_NEXT, getattr(last, self.field), last.pk
+            )
+        if rows and has_previous:
+            first = rows[0]
+            previous_cursor = encode_cursor(
+                CURSOR_PREVIOUS, getattr(first, self.field), first.pk
+            )
+        return CursorPage(rows, self, cursor, next_cursor, previous_cursor)
 
 
 def pagination(request, posts):
+    if settings.POSTS_PAGINATION_MODE == 'cursor':
+        paginator = CursorPaginator(posts, POSTS_COUNT)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
     paginator = Paginator(posts, POSTS_COUNT)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def count_queries(statements):
+    """Число запросов к данным среди SQL statements без служебных
+    SAVEPOINT."""
+    return sum(
+        1 for sql in statements
+        if not sql.startswith(TRANSACTION_STATEMENTS)
+    )
+
+
+def query_budget(limit):
+    """Объявляет, во сколько SQL-запросов укладывается view.
+
+    Бюджет считается на весь запрос авторизованного пользователя,
+    включая сессию, при холодном кэше и не должен зависеть от числа
+    постов на странице.
+    В режиме DEBUG превышение пишется в лог.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not settings.DEBUG:
+                return view(request, *args, **kwargs)
+            statements = []
+
+            def record(execute, sql, params, many, context):
+                statements.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(record):
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+            count = count_queries(statements)
+            if count > limit:
+                logger.warning(
+                    '%s: %d SQL-запросов при бюджете %d',
+                    view.__name__, count, limit
+                )
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def conditional(state, csrf=False):
+    """Отвечает 304, пока не изменилось состояние, от которого зависит view.
+
+    state(request, *args, **kwargs) не больше чем одним запросом по
+    индексу возвращает кортеж (last_modified, *прочие значения) или None,
+    если объекта нет; last_modified может быть None.
+    ETag строится из всех значений и пользователя, Last-Modified — из
+    первого. Удаления меняют только ETag, поэтому клиентам, которые
+    присылают лишь If-Modified-Since, они видны не сразу.
+    Страницы с формой для авторизованных передают csrf=True: в ETag
+    входит CSRF-токен, и после нового входа браузер не покажет
+    сохранённую форму со старым токеном.
+    """
+    def get_state(request, *args, **kwargs):
+        if not hasattr(request, '_conditional_state'):
+            request._conditional_state = state(request, *args, **kwargs)
+        return request._conditional_state
+
+    def etag(request, *args, **kwargs):
+        values = get_state(request, *args, **kwargs)
+        if values is None:
+            return None
+        if csrf and request.user.is_authenticated:
+            # get_token каждый раз маскирует секрет заново; в ETag идёт
+            # сам секрет, который get_token кладёт в META.
+            get_token(request)
+            values = (*values, request.META['CSRF_COOKIE'])
+        raw = repr((request.user.pk, *values))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        values = get_state(request, *args, **kwargs)
+        return values[0] if values else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
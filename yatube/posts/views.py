@@ -1,50 +1,176 @@
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import (
+    Count, DateTimeField, Max, OuterRef, Subquery
+)
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 
-from .forms import PostForm, CommentForm, Comment
-from .models import Group, Post, User, Follow
-from .utils import pagination
+from . import (
+    autocomplete, caching, feed, follows, groups, search, tags, trending,
+)
+from .forms import PostForm, CommentForm
+from .models import Comment, Post, Tag, User, Follow
+from .utils import (
+    COMMENTS_COUNT, CURSOR_PARAM, POSTS_COUNT, CursorPaginator, conditional,
+    pagination, query_budget,
+)
 
 
+def _per_row(queryset, field, aggregate, output_field):
+    rows = queryset.filter(**{field: OuterRef('pk')}).order_by()
+    return Subquery(
+        rows.values(field).annotate(value=aggregate).values('value'),
+        output_field=output_field,
+    )
+
+
+def _index_state(request):
+    # Без запросов к базе, пока популярное в кэше: главную меняет только
+    # смена этих поколений. Пересчёт популярного может сменить второе,
+    # поэтому он идёт раньше.
+    trending.top()
+    return (
+        None,
+        caching.generation('posts'),
+        caching.generation(trending.SCOPE),
+    )
+
+
+def _group_state(request, slug):
+    group = groups.get(slug)
+    if group is None:
+        return None
+    return (*Post.objects.filter(group=group).aggregate(
+        last=Max('updated_at'), count=Count('pk')
+    ).values(), group.title, group.description)
+
+
+def _profile_state(request, username):
+    return User.objects.filter(username=username).annotate(
+        last=_per_row(Post.objects, 'author', Max('updated_at'),
+                      DateTimeField()),
+    ).values_list(
+        'last', 'first_name', 'last_name', 'stats__posts_count',
+        'stats__followers_count', 'stats__following_count',
+    ).first()
+
+
+def _post_state(request, post_id):
+    state = Post.objects.filter(pk=post_id).annotate(
+        last_comment=_per_row(Comment.objects, 'post', Max('created'),
+                              DateTimeField()),
+    ).values_list(
+        'updated_at', 'last_comment', 'comments_count',
+        'author__stats__posts_count',
+    ).order_by('pk').first()
+    if state is None:
+        return None
+    updated_at, last_comment, *counts = state
+    return (max(updated_at, last_comment or updated_at), *counts)
+
+
+@query_budget(9)
+@conditional(_index_state)
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.select_related('author')
     page_obj = pagination(request, posts)
     context = {
         'page_obj': page_obj,
+        'trending': trending.top(),
+    }
+    return caching.tag(
+        render(request, 'posts/index.html', context),
+        'posts', trending.SCOPE,
+    )
+
+
+@query_budget(6)
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.Results(query), POSTS_COUNT)
+    context = {
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'query': query,
     }
-    return render(request, 'posts/index.html', context)
+    return caching.tag(
+        render(request, 'posts/search.html', context), 'posts'
+    )
+
 
+@query_budget(2)
+def autocomplete_names(request):
+    prefix = request.GET.get('q', '').strip()
+    if not prefix:
+        return JsonResponse({'users': [], 'groups': []})
+    return JsonResponse(autocomplete.suggest(prefix))
 
+
+@query_budget(6)
+@conditional(_group_state)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.select_related('group', 'author').filter(group=group)
+    group = groups.get_or_404(slug)
+    posts = Post.objects.select_related('author').filter(group=group)
     page_obj = pagination(request, posts)
     context = {
         'page_obj': page_obj,
         'group': group,
     }
-    return render(request, 'posts/group_list.html', context)
+    return caching.tag(
+        render(request, 'posts/group_list.html', context),
+        caching.scope('group', group.pk),
+    )
+
+
+@query_budget(6)
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.casefold())
+    page_obj = pagination(request, tags.timeline(tag))
+    context = {
+        'page_obj': page_obj,
+        'tag': tag,
+    }
+    return caching.tag(
+        render(request, 'posts/tag_list.html', context), 'posts'
+    )
 
 
+@query_budget(8)
+@conditional(_profile_state)
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     posts = user.posts.all()
     page_obj = pagination(request, posts)
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=user
-        ).exists()
     context = {
         'author': user,
         'page_obj': page_obj,
-        'following': following,
+        'following': follows.is_following(request.user, user.pk),
     }
-    return render(request, 'posts/profile.html', context)
+    return caching.tag(
+        render(request, 'posts/profile.html', context),
+        caching.scope('author', user.pk),
+    )
 
 
+@query_budget(3)
+def post_comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё»."""
+    context = {
+        'post_id': post_id,
+        'comments': _comments_page(request, post_id),
+    }
+    return caching.tag(
+        render(request, 'includes/comment_list.html', context),
+        caching.scope('post', post_id),
+    )
+
+
+@query_budget(7)
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -55,19 +181,37 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def _comments_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    return CursorPaginator(comments, COMMENTS_COUNT, field='created').get_page(
+        request.GET.get(CURSOR_PARAM)
+    )
+
+
+@query_budget(6)
+@conditional(_post_state, csrf=True)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = Comment.objects.filter(post_id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
+        'post_id': post.pk,
         'form': form,
-        'comments': comments
+        'comments': _comments_page(request, post.pk),
     }
-    return render(request, 'posts/post_detail.html', context)
+    return caching.tag(
+        render(request, 'posts/post_detail.html', context),
+        caching.scope('post', post.pk),
+        caching.scope('author', post.author_id),
+        post.group_id and caching.scope('group', post.group_id),
+    )
 
 
+@query_budget(7)
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -81,7 +225,9 @@ def post_create(request):
     return redirect('posts:profile', post.author.username)
 
 
+@query_budget(5)
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     is_edit = True
     post = get_object_or_404(Post, pk=post_id)
@@ -90,7 +236,7 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post
     )
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post.pk)
 
     if form.is_valid():
@@ -103,19 +249,19 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(6)
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user
-    )
-    page_obj = pagination(request, posts)
+    page_obj = pagination(request, feed.timeline(request.user))
     context = {
         'page_obj': page_obj
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(9)
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -123,7 +269,9 @@ def profile_follow(request, username):
     return redirect('posts:profile', author.username)
 
 
+@query_budget(7)
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     Follow.objects.filter(
         user=request.user,
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -26,11 +27,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.PageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -114,8 +115,94 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# LRU в памяти процесса перед общим для всех процессов SQLite-файлом;
+# файл лежит вне дерева исходников, тесты подменяют его временным
+CACHE_FILE = os.environ.get(
+    'YATUBE_CACHE_FILE',
+    os.path.join(tempfile.gettempdir(), 'yatube-cache.sqlite3'),
+)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'posts.cache_backends.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'SYNC_INTERVAL': 1,
+        },
+    },
+    'shared': {
+        'BACKEND': 'posts.cache_backends.SQLiteCache',
+        'LOCATION': CACHE_FILE,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
+
+TEST_RUNNER = 'posts.tests.runner.TestRunner'
+
+# 'page' — номера страниц, 'cursor' — keyset-пагинация по (pub_date, id)
+POSTS_PAGINATION_MODE = 'page'
+
+# Посты авторов, у которых подписчиков больше порога, не раскладываются
+# по лентам при публикации, а подмешиваются при чтении. Обратно на
+# раскладку автор переходит, когда подписчиков меньше
+# FEED_FANOUT_THRESHOLD * FEED_PUSH_RATIO; переводит команда
+# sync_feed_delivery
+FEED_FANOUT_THRESHOLD = 10000
+FEED_PUSH_RATIO = 0.5
+# Подписка и переход на раскладку кладут в ленту столько последних
+# постов автора (двадцать страниц)
+FEED_BACKFILL_DEPTH = 200
+
+# Предельный срок жизни страниц в кэше анонимных ответов, секунды;
+# обычно их раньше сбрасывает смена поколения суррогатного ключа
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Фрагменты, которые устаревают по поколению или updated_at, и без того
+# хранятся не дольше суток: ключи удалённых постов не копятся в кэше
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Пока один запрос пересчитывает значение (не дольше блокировки),
+# остальные получают прежнее; запись живёт на CACHE_GRACE дольше срока
+CACHE_LOCK_TIMEOUT = 10
+CACHE_GRACE = 30
+
+# Загрузки пишутся во временный файл, а не в память; сверх
+# IMAGE_MAX_UPLOAD_SIZE байт обработчик данные не сохраняет
+FILE_UPLOAD_HANDLERS = ['posts.uploads.CappedUploadHandler']
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+# Картинки с большим числом пикселей отклоняются по заголовку,
+# остальные уменьшаются до IMAGE_MAX_DIMENSION по большей стороне
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_DIMENSION = 2560
+# Контрольная точка rebuild_images: состояние запуска, а не исходники,
+# поэтому вне дерева проекта
+IMAGE_REBUILD_CHECKPOINT = os.environ.get(
+    'YATUBE_REBUILD_IMAGES_CHECKPOINT',
+    os.path.join(tempfile.gettempdir(), 'yatube-rebuild_images.checkpoint'),
+)
+
+# Файлы называются по хэшу содержимого, одинаковые загрузки делят
+# один файл; файл без ссылок удаляется не раньше чем через столько секунд
+DEFAULT_FILE_STORAGE = 'posts.storage.ContentAddressedStorage'
+MEDIA_COLLECT_DELAY = 60 * 60
+# Содержимое по URL медиафайла не меняется; так же их должен
+# отдавать и веб-сервер
+MEDIA_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Результаты поиска ранжируются по BM25, пока совпадений не больше
+# порога; иначе выдаются от новых к старым
+SEARCH_RANK_LIMIT = 1000
+
+# Популярное: события считаются по интервалам TRENDING_BUCKET секунд за
+# последние TRENDING_WINDOW; вес интервала вдвое падает каждые
+# TRENDING_HALF_LIFE. Первые TRENDING_TOP мест пересчитываются не реже
+# раза в TRENDING_REFRESH секунд и командой roll_trending
+TRENDING_BUCKET = 60 * 60
+TRENDING_WINDOW = 24 * 60 * 60
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_TOP = 5
+TRENDING_REFRESH = 5 * 60